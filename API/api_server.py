@@ -1,30 +1,1474 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
+import asyncio, bisect, fcntl, functools, gzip, hashlib, inspect, io, json, mmap, os, queue, re, sys, tempfile, threading, time, uuid, zlib
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+from pydantic import BaseModel, ValidationError
 from typing import Optional
 
+try:
+    import zstandard                        # optional — enables zstd alongside gzip
+except ImportError:
+    zstandard = None
+
+try:
+    import numpy as np                      # optional — enables /series
+except ImportError:
+    np = None
+
+try:                                        # optional — the converter's parser (numpy + pandas)
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "TXT-CSV"))
+    from converter import parse_arrays      # enables parse-on-ingest and /table
+except ImportError:
+    parse_arrays = None
+
+try:
+    import pyarrow as pa                    # optional — Arrow IPC flavour of /table
+except ImportError:
+    pa = None
+
+# ── Content-Encoding ──────────────────────────────────────────
+# Request bodies may arrive gzip/zstd-compressed (decoded by DecodingRoute);
+# responses are compressed per Accept-Encoding and the compressed bytes
+# are cached on the session, so repeated reads never recompress.
+ENCODINGS = ("zstd", "gzip") if zstandard else ("gzip",)
+
+def decode_body(body: bytes, enc: Optional[str]) -> bytes:
+    enc = (enc or "identity").strip().lower()
+    if enc == "identity": return body
+    try:
+        if enc == "gzip": return gzip.decompress(body)
+        if enc == "zstd" and zstandard:
+            return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    except Exception:
+        raise HTTPException(status_code=400, detail=f"Malformed {enc} body")
+    raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {enc}")
+
+def stream_decoder(enc: Optional[str]):
+    """decode_body for a body read piece by piece: chunk → decoded bytes (may be empty)."""
+    enc = (enc or "identity").strip().lower()
+    if enc == "identity": return bytes
+    if enc == "gzip": return zlib.decompressobj(wbits=31).decompress
+    if enc == "zstd" and zstandard: return zstandard.ZstdDecompressor().decompressobj().decompress
+    raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {enc}")
+
+def encode_body(data: bytes, enc: str) -> bytes:
+    if enc == "zstd": return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+def pick_encoding(accept: str) -> Optional[str]:
+    """Best of ENCODINGS listed in Accept-Encoding (q=0 excluded), else None."""
+    offered = {}
+    for item in (accept or "").lower().split(","):
+        name, _, q = item.strip().partition(";q=")
+        try:    offered[name.strip()] = float(q) if q else 1.0
+        except ValueError: pass
+    return next((e for e in ENCODINGS if offered.get(e, offered.get("*", 0)) > 0), None)
+
+class DecodingRequest(Request):
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            self._body = decode_body(await super().body(), self.headers.get("content-encoding"))
+        return self._body
+
+class DecodingRoute(APIRoute):
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        async def decoding_handler(request: Request):
+            return await handler(DecodingRequest(request.scope, request.receive))
+        return decoding_handler
+
+# ── Metrics & Server-Timing ───────────────────────────────────
+# Per-process counters and histograms, rendered in the Prometheus text
+# format at /metrics for every worker (see "/metrics" below).  Recording
+# is a bisect and a few list increments under one short per-family lock.  Every response
+# also carries Server-Timing: validate (body read + decode + pydantic,
+# up to the endpoint call), store, serialize and total, in ms.
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS    = (2**10, 2**14, 2**17, 2**20, 2**22, 2**24, 2**26, 2**28)
+TIMINGS         = ContextVar("TIMINGS", default=None)
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple):
+        self.name, self.help, self.buckets = name, help, buckets
+        self.series = {}                    # labels → [count per bucket …, +Inf, sum]
+        self.lock   = threading.Lock()
+
+    def observe(self, labels: tuple, v: float):
+        i = bisect.bisect_left(self.buckets, v)
+        with self.lock:
+            row = self.series.get(labels)
+            if row is None: row = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[i] += 1; row[-1] += v
+
+    def snapshot(self) -> list:
+        with self.lock: return [[list(k), list(v)] for k, v in self.series.items()]
+
+    def render(self, names: tuple, workers: dict) -> list:
+        """`workers`: worker → snapshot() of that worker's copy of this family."""
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for worker, labels, row in ((w, k, v) for w, rows in workers.items() for k, v in rows):
+            lab = ",".join(f'{n}="{prom_label(v)}"' for n, v in zip(names + ("worker",), [*labels, worker]))
+            acc = 0
+            for le, n in zip(self.buckets + ("+Inf",), row):
+                acc += n
+                out.append(f'{self.name}_bucket{{{lab},le="{le}"}} {acc}')
+            out += [f"{self.name}_sum{{{lab}}} {row[-1]:.6f}", f"{self.name}_count{{{lab}}} {acc}"]
+        return out
+
+LATENCY   = Histogram("pump_request_duration_seconds", "Request latency by route.", LATENCY_BUCKETS)
+REQ_SIZE  = Histogram("pump_request_body_bytes", "Request body size on the wire.", SIZE_BUCKETS)
+RESP_SIZE = Histogram("pump_response_body_bytes", "Response body size on the wire.", SIZE_BUCKETS)
+HISTOGRAMS = (LATENCY, REQ_SIZE, RESP_SIZE)
+REQUESTS  = {}                              # (route, method, status) → count
+REQ_LOCK  = threading.Lock()
+
+def prom_label(v) -> str:
+    """A label value in the text format: only backslash, double quote and newline are escaped."""
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+@contextmanager
+def timed(name: str):
+    """Add the block's wall time to this request's Server-Timing entry `name`."""
+    t0 = time.perf_counter()
+    try:     yield
+    finally:
+        t = TIMINGS.get()
+        if t is not None: t[name] = t.get(name, 0.0) + time.perf_counter() - t0
+
+def _validated():
+    t = TIMINGS.get()
+    if t is not None: t["validate"] = time.perf_counter() - t["_t0"]
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t = {"_t0": time.perf_counter()}
+        TIMINGS.set(t)
+        io_ = {"in": 0, "out": 0, "status": 500}
+
+        async def counting_receive():
+            msg = await receive()
+            io_["in"] += len(msg.get("body", b""))
+            return msg
+
+        async def timing_send(msg):
+            if msg["type"] == "http.response.start":
+                io_["status"] = msg["status"]
+                t["total"] = time.perf_counter() - t["_t0"]
+                hdr = ", ".join(f"{k};dur={v * 1000:.2f}" for k, v in t.items() if not k.startswith("_"))
+                msg["headers"] = list(msg.get("headers", [])) + [(b"server-timing", hdr.encode())]
+            elif msg["type"] == "http.response.body":
+                io_["out"] += len(msg.get("body", b""))
+            await send(msg)
+
+        try:
+            await self.app(scope, counting_receive, timing_send)
+        finally:
+            route  = getattr(scope.get("route"), "path", "unmatched")
+            labels = (route, scope["method"])
+            LATENCY.observe(labels, time.perf_counter() - t["_t0"])
+            REQ_SIZE.observe(labels, io_["in"])
+            RESP_SIZE.observe(labels, io_["out"])
+            key = labels + (str(io_["status"]),)
+            with REQ_LOCK: REQUESTS[key] = REQUESTS.get(key, 0) + 1
+
+class TimedRoute(DecodingRoute):
+    """Stamps the end of request validation as the endpoint is entered."""
+    def __init__(self, path: str, endpoint, **kw):
+        if inspect.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def timed_endpoint(*a, **k):
+                _validated()
+                return await endpoint(*a, **k)
+        else:
+            @functools.wraps(endpoint)
+            def timed_endpoint(*a, **k):
+                _validated()
+                return endpoint(*a, **k)
+        super().__init__(path, timed_endpoint, **kw)
+
+# ── Bounded ingest ────────────────────────────────────────────
+# Routes that carry a session body are admitted through one gate per
+# worker: at most INGEST_SLOTS requests in flight and INGEST_BYTES of
+# declared body (Content-Length, CHUNK_RESERVE when streamed without
+# one; a bulk upload holds one record at a time and reserves at most
+# BULK_LINE_MAX).  Finalizing a chunked upload reads and decodes the
+# whole part file, so it reserves the part's size on disk.  A request
+# that doesn't fit is answered 429 at once, before its body is read,
+# with Retry-After from the recent ingest rate.  The gate only runs on
+# the event loop, so it needs no lock.
+INGEST_SLOTS  = int(os.environ.get("PUMP_INGEST_SLOTS", "8"))
+INGEST_BYTES  = int(os.environ.get("PUMP_INGEST_MB", "256")) * 2**20
+CHUNK_RESERVE = 2**20                       # the device client's PUT window
+BULK_LINE_MAX = 64 * 2**20                  # longest NDJSON record accepted by /upload/bulk
+
+def _part_bytes(request: Request) -> int:
+    try:    return os.path.getsize(_part(request.path_params["uid"]))
+    except (HTTPException, OSError): return 0      # unknown upload → the handler answers 404
+
+INGEST_ROUTES = {("POST", "/upload"): None, ("POST", "/upload/raw"): None, ("PUT", "/uploads/{uid}"): None,
+                 ("POST", "/upload/bulk"): BULK_LINE_MAX, ("POST", "/live/{sid}/append"): None,
+                 ("POST", "/uploads/{uid}/finalize"): _part_bytes}   # route → reservation cap or size(request)
+
+class IngestGate:
+    def __init__(self, slots: int, budget: int):
+        self.slots, self.budget = slots, budget
+        self.active, self.bytes = 0, 0
+        self.rate = 50 * 2**20                  # bytes/s, moving average of finished bodies
+
+    def enter(self, n: int) -> bool:
+        if self.active >= self.slots or (self.active and self.bytes + n > self.budget):
+            return False
+        self.active += 1; self.bytes += n
+        return True
+
+    def leave(self, n: int, secs: float):
+        self.active -= 1; self.bytes -= n
+        self.rate = 0.8 * self.rate + 0.2 * n / max(secs, 1e-3)
+
+    def retry_after(self) -> int:
+        return min(30, max(1, round(self.bytes / self.rate)))
+
+gate = IngestGate(INGEST_SLOTS, INGEST_BYTES)
+
+class IngestRoute(TimedRoute):
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        routes = [(m, self.path) for m in self.methods if (m, self.path) in INGEST_ROUTES]
+        if not routes:
+            return handler
+        cap = INGEST_ROUTES[routes[0]]
+        async def gated_handler(request: Request):
+            try:    n = int(request.headers["content-length"])
+            except (KeyError, ValueError): n = CHUNK_RESERVE
+            if callable(cap): n = cap(request)
+            elif cap:         n = min(n, cap)
+            if not gate.enter(n):
+                return JSONResponse({"detail": "Ingest is at capacity, retry later"}, status_code=429,
+                                    headers={"Retry-After": str(gate.retry_after())})
+            t0 = time.perf_counter()
+            try:     return await handler(request)
+            finally: gate.leave(n, time.perf_counter() - t0)
+        return gated_handler
+
 app = FastAPI(root_path="/api")
+app.router.route_class = IngestRoute
+app.add_middleware(MetricsMiddleware)
 
-latest_txt_data = {
-    "content":       None,
-    "device_name":   None,
-    "sampling_rate": None,
-    "duration_val":  None,
-}
+MAX_SESSIONS = int(os.environ.get("PUMP_MAX_SESSIONS", "500"))
+MAX_BYTES    = int(os.environ.get("PUMP_MAX_MB", "512")) * 2**20
+UPLOAD_DIR   = os.environ.get("PUMP_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "pump_uploads"))
+UPLOAD_TTL   = 24 * 3600                    # unfinished chunked uploads are dropped after a day
+DATA_DIR     = os.environ.get("PUMP_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+SEGMENT_MB   = int(os.environ.get("PUMP_SEGMENT_MB", "64"))   # PUMP_DATA_DIR="" → memory only
 
-class TXTData(BaseModel):
-    content:       str
+class UploadMeta(BaseModel):
     device_name:   Optional[str]  = None
     sampling_rate: Optional[int]  = None
     duration_val:  Optional[int]  = None
 
+class TXTData(UploadMeta):
+    content:       str
+
+# ── Record index ──────────────────────────────────────────────
+# Character offset of every "#Vibration Value" header plus its timestamp
+# (whole seconds, device wall clock), built while the text arrives so a
+# time window or record page is two bisects and one slice of the buffer.
+RECORD_RE = re.compile(r"#Vibration Value[^\n]*\n([^\n]*)\n")
+TS_RE     = re.compile(r"\s*(\d+)/(\d+)/(\d+)\s+(\d+):(\d+):(\d+)\s*([AaPp][Mm])?")
+HEAD_MAX  = 128                             # longest header + timestamp line kept for the next scan
+_days     = {}                              # (y, m, d) → proleptic ordinal
+
+def _seconds(y: int, mo: int, d: int, h: int, mi: int, sec: int) -> int:
+    day = _days.get((y, mo, d))
+    if day is None:
+        day = _days[(y, mo, d)] = datetime(y, mo, d).toordinal()
+    return day * 86400 + h * 3600 + mi * 60 + sec
+
+def parse_when(v: str) -> int:
+    """ISO 8601 or the device's "M/D/YYYY h:mm:ss AM" → index seconds."""
+    m = TS_RE.fullmatch(v.strip())
+    try:
+        if m:
+            mo, d, y, h, mi, sec = map(int, m.groups()[:6])
+            if m[7]: h = h % 12 + 12 * (m[7].upper() == "PM")
+            return _seconds(y, mo, d, h, mi, sec)
+        t = datetime.fromisoformat(v.strip())
+        return _seconds(t.year, t.month, t.day, t.hour, t.minute, t.second)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Unrecognised time: {v!r}")
+
+def new_index() -> dict:
+    return {"off": array("q"), "ts": array("q"), "scan": 0, "tail": ""}
+
+def extend_index(idx: dict, text: str):
+    """Index the records in `text`, which continues the already indexed text."""
+    buf, base, last = idx["tail"] + text, idx["scan"], 0
+    prev = idx["ts"][-1] if idx["ts"] else 0
+    for m in RECORD_RE.finditer(buf):
+        t = TS_RE.match(m[1])
+        if t:
+            mo, d, y, h, mi, sec = map(int, t.groups()[:6])
+            if t[7]: h = h % 12 + 12 * (t[7].upper() == "PM")
+            try:    prev = _seconds(y, mo, d, h, mi, sec)
+            except ValueError: pass           # impossible date — keep the previous stamp
+        idx["off"].append(base + m.start())
+        idx["ts"].append(prev)
+        last = m.end()
+    keep = max(last, len(buf) - HEAD_MAX)
+    idx["tail"], idx["scan"] = buf[keep:], base + keep
+
+# ── Parse on ingest ───────────────────────────────────────────
+# Finished sessions are parsed once, on a background thread, into the
+# converter's 57-feature table: epoch-second timestamps plus one
+# contiguous float32 array per column (Parameter-k_{X,Y,Z}).  The parser
+# is converter.parse_arrays itself, so a table always has the rows and
+# values the converter would get from the same TXT.  A time line the
+# converter keeps as raw text is null in /table and carries the previous
+# stamp everywhere else, as in the record index.
+TABLE_COLS = [f"Parameter-{k}_{ax}" for k in range(1, 20) for ax in "XYZ"]
+
+def parse_table(text: str) -> dict:
+    """TXT → {Time: int64 epoch seconds, exact: bool, values: float32 (57, records)}."""
+    _, stamps, values = parse_arrays(text)
+    exact = ~np.isnat(stamps)
+    last  = np.maximum.accumulate(np.where(exact, np.arange(len(exact)), -1))
+    t     = np.where(last >= 0, stamps.astype(np.int64)[np.maximum(last, 0)], 0)
+    return {"Time": t, "exact": exact, "values": np.ascontiguousarray(values.T, dtype=np.float32)}
+
+# ── Series pyramid ────────────────────────────────────────────
+# Per column min/max/mean over buckets of 4, 16, 64 … records, built once
+# with the table.  A chart asks for its pixel width and gets the finest
+# level that fits, so its cost is set by the width, not the session.
+PYRAMID_FAN = 4
+PYRAMID_MIN = 64                            # coarsest level has at most this many buckets
+CHART_COLS  = [f"Parameter-{k}_{ax}" for k in (1, 2, 3) for ax in "XYZ"]
+
+def build_pyramid(ts, values) -> list:
+    """[{bucket, Time, min, max, mean}] per level, each PYRAMID_FAN× coarser than the last."""
+    def fold(a, fill, ufunc):
+        pad = -a.shape[1] % PYRAMID_FAN
+        if pad: a = np.concatenate((a, np.full((len(a), pad), fill, a.dtype)), axis=1)
+        return ufunc.reduce(a.reshape(len(a), -1, PYRAMID_FAN), axis=2)
+    lo = hi = values
+    tot, cnt = np.nan_to_num(values).astype(np.float64), (~np.isnan(values)).astype(np.int64)
+    levels, t, b = [], ts, 1
+    while lo.shape[1] > PYRAMID_MIN:
+        lo, hi   = fold(lo, np.nan, np.fmin), fold(hi, np.nan, np.fmax)
+        tot, cnt = fold(tot, 0, np.add), fold(cnt, 0, np.add)
+        t, b     = t[::PYRAMID_FAN], b * PYRAMID_FAN
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = (tot / cnt).astype(np.float32)
+        levels.append({"bucket": b, "Time": t, "min": lo, "max": hi, "mean": mean})
+    return levels
+
+# ── Durable, shared segments ──────────────────────────────────
+# Every store change is one JSON line in index.jsonl — add, append, close
+# or drop, stamped with the next store-wide version — and any session
+# bytes go first to seg-NNNNNN.log files that roll over at SEGMENT_MB
+# (uploads carry their record index as raw int64 offsets + stamps right
+# after the text).  A line is written only after its data, under an
+# exclusive flock, so every uvicorn/gunicorn worker can share one data
+# dir: before answering, a worker applies the lines other workers
+# appended since it last looked, and a session is either fully there or
+# not there at all.  Segments with no sessions left are deleted; fsync
+# runs once a second off the request path.  On start, the first worker
+# rewrites index.jsonl without dropped sessions; content stays in the
+# mmapped segments until a session is first read.
+class SegmentLog:
+    def __init__(self, root: str, seg_bytes: int):
+        os.makedirs(root, exist_ok=True)
+        self.root, self.seg_bytes = root, seg_bytes
+        self.path  = os.path.join(root, "index.jsonl")
+        self.lockf = open(os.path.join(root, "index.lock"), "a")
+        self.held  = 0                      # re-entrant depth of the exclusive flock
+        self.maps  = {}                     # segment → mmap, grown on demand
+        self.count = {}                     # segment → sessions with data in it
+        self.where = {}                     # id → segments holding its data
+        self.sizes = {}                     # segment → last known file size
+        self.cur, self.seg = 0, None        # segment being appended to, its fd
+        self.seg_no = 0
+        self.fd, self.pos, self.dirty = None, 0, False
+        self.mlock = threading.Lock()       # guards maps
+
+    def _path(self, seg: int) -> str:
+        return os.path.join(self.root, f"seg-{seg:06d}.log")
+
+    def open(self):
+        """Compact the index unless another worker has it open, then start tailing it.
+        The compacting (first) worker also starts a new epoch for this server run."""
+        self.alive = open(os.path.join(self.root, "workers.lock"), "a")
+        epoch = os.path.join(self.root, "epoch")
+        try:
+            fcntl.flock(self.alive, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self._compact()
+            with open(epoch + ".tmp", "w") as f:
+                f.write(uuid.uuid4().hex[:12])
+            os.replace(epoch + ".tmp", epoch)
+        except BlockingIOError:
+            pass
+        fcntl.flock(self.alive, fcntl.LOCK_SH)   # held for life; waits out a compacting worker
+        with open(epoch) as f:
+            self.epoch = f.read().strip()
+        self.fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        threading.Thread(target=self._fsync, name="segment-fsync", daemon=True).start()
+
+    def _compact(self):
+        keep = OrderedDict()                # id → its lines
+        try:
+            with open(self.path, "rb") as f:
+                for line in f:
+                    try:    e = json.loads(line)
+                    except ValueError: continue     # torn line after a crash
+                    if e.get("op") == "drop": keep.pop(e.get("id"), None)
+                    elif e.get("op") == "add" or e.get("id") in keep:
+                        keep.setdefault(e.get("id"), []).append(line.rstrip(b"\n") + b"\n")
+        except FileNotFoundError:
+            pass
+        used = {json.loads(l).get("seg") for lines in keep.values() for l in lines}
+        with open(self.path + ".tmp", "wb") as f:
+            f.writelines(l for lines in keep.values() for l in lines)
+            f.flush(); os.fsync(f.fileno())
+        os.replace(self.path + ".tmp", self.path)
+        for name in os.listdir(self.root):
+            if name.startswith("seg-") and name.endswith(".log") and int(name[4:10]) not in used:
+                os.remove(os.path.join(self.root, name))
+
+    @contextmanager
+    def exclusive(self):
+        if not self.held: fcntl.flock(self.lockf, fcntl.LOCK_EX)
+        self.held += 1
+        try:     yield
+        finally:
+            self.held -= 1
+            if not self.held: fcntl.flock(self.lockf, fcntl.LOCK_UN)
+
+    def tail(self) -> list:
+        """Entries appended since the last call (complete lines only)."""
+        size = os.fstat(self.fd).st_size
+        if size <= self.pos: return []
+        buf = os.pread(self.fd, size - self.pos, self.pos)
+        end = buf.rfind(b"\n") + 1
+        self.pos += end
+        out = []
+        for line in buf[:end].splitlines():
+            try:    out.append(json.loads(line))
+            except ValueError: pass         # torn line after a crash
+        return out
+
+    def has(self, e: dict) -> bool:
+        """Did the entry's data reach the segment?  Also registers it for reference counting."""
+        if "seg" not in e: return True
+        seg, end = e["seg"], e["off"] + e["len"] + 16 * e.get("records", 0) * (e["op"] == "add")
+        if self.sizes.get(seg, -1) < end:
+            try:    self.sizes[seg] = os.path.getsize(self._path(seg))
+            except OSError: self.sizes[seg] = -1
+            if self.sizes[seg] < end: return False
+        self.cur = max(self.cur, seg)
+        segs = self.where.setdefault(e["id"], set())
+        if seg not in segs:
+            segs.add(seg)
+            self.count[seg] = self.count.get(seg, 0) + 1
+        return True
+
+    def append(self, e: dict, *chunks: bytes) -> dict:
+        """Write chunks to the current segment, then the entry line (caller holds exclusive())."""
+        if os.fstat(self.fd).st_size > self.pos:
+            os.write(self.fd, b"\n")           # fence off a torn line left by a crash
+        if chunks:
+            n = sum(map(len, chunks))
+            try:    size = os.path.getsize(self._path(self.cur)) if self.cur else 0
+            except OSError: size = 0
+            if not self.cur or (size and size + n > self.seg_bytes):
+                self.cur += 1
+            if self.seg is None or self.seg_no != self.cur:
+                if self.seg is not None: os.close(self.seg)
+                self.seg, self.seg_no = os.open(self._path(self.cur), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644), self.cur
+            e["seg"], e["off"] = self.cur, os.lseek(self.seg, 0, os.SEEK_END)
+            for c in chunks:
+                view = memoryview(c)
+                while view: view = view[os.write(self.seg, view):]
+            self.has(e)
+        os.write(self.fd, (json.dumps(e) + "\n").encode("utf-8"))
+        self.pos, self.dirty = os.fstat(self.fd).st_size, True
+        return e
+
+    def release(self, sid: str, delete: bool):
+        """Forget a dropped session; the worker that dropped it deletes emptied segments."""
+        for seg in self.where.pop(sid, ()):
+            self.count[seg] -= 1
+            if self.count[seg] or seg == self.cur: continue
+            del self.count[seg]
+            with self.mlock:
+                mm = self.maps.pop(seg, None)
+                if mm: mm.close()
+            if delete:
+                os.fsync(self.fd)           # the drop is durable before the data goes
+                try:    os.remove(self._path(seg))
+                except OSError: pass
+
+    def read(self, seg: int, off: int, n: int) -> bytes:
+        with self.mlock:
+            mm = self.maps.get(seg)
+            if mm is None or off + n > len(mm):
+                with open(self._path(seg), "rb") as f:
+                    mm = self.maps[seg] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return mm[off:off + n]
+
+    def _fsync(self):
+        while True:
+            time.sleep(1)
+            if not self.dirty: continue
+            self.dirty = False
+            try:
+                if self.seg is not None: os.fsync(self.seg)
+                os.fsync(self.fd)
+            except OSError: pass
+
+# ── Session store ─────────────────────────────────────────────
+# Sessions live in one LRU-ordered dict (read → most recent) and are
+# evicted oldest-first once MAX_SESSIONS or MAX_BYTES is exceeded.
+# Per-device and global upload order are kept in their own ordered
+# dicts, so "latest" lookups and removals are O(1) for any fleet size.
+# With a SegmentLog every change goes through _change(): logged first,
+# then applied — the same _apply() replays other workers' entries.
+class SessionStore:
+    def __init__(self, max_sessions: int, max_bytes: int, log: Optional[SegmentLog] = None):
+        self.max_sessions, self.max_bytes = max_sessions, max_bytes
+        self.log     = log
+        self.lru     = OrderedDict()        # id → session dict
+        self.order   = OrderedDict()        # id → None, upload order
+        self.devices = {}                   # device → OrderedDict(id → None)
+        self.hashes  = {}                   # content hash → id, finished uploads only
+        self.keys    = {}                   # Idempotency-Key → id
+        self.nbytes  = 0
+        self.version = 0                    # bumped on every change, see etag()
+        self.lock    = threading.Lock()
+        self.on_ready = None                # called with each session that becomes complete
+        self.epoch   = uuid.uuid4().hex[:12]   # this server run; versions only compare within one
+        if log:
+            log.open()
+            self.epoch = log.epoch
+            self._sync()
+
+    @contextmanager
+    def _change(self):
+        """One logged change: exclusive across workers, this view brought up to date first.
+        Caller holds self.lock."""
+        if self.log is None:
+            yield
+            return
+        with self.log.exclusive():
+            self._sync()
+            yield
+
+    def _sync(self):
+        """Apply what other workers logged since we last looked (caller holds self.lock)."""
+        if self.log:
+            for e in self.log.tail():
+                if self.log.has(e): self._apply(e)
+
+    def _apply(self, e: dict):
+        self.version = max(self.version, e.get("version", 0))
+        op, sid = e.get("op"), e.get("id")
+        if op == "add" and sid not in self.lru:
+            s = {k: e.get(k) for k in ("id", "device_name", "sampling_rate", "duration_val",
+                                        "size", "received_at", "live", "version", "hash", "key")}
+            s |= {"content": "" if s["live"] else None, "blobs": {}, "blob_bytes": 0, "index": new_index()}
+            if s["live"]:
+                s["parts"] = [""]
+            else:                           # record index comes from the segment, text on first read
+                n  = e.get("records", 0)
+                ix = self.log.read(e["seg"], e["off"] + e["len"], 16 * n)
+                s["index"]["off"].frombytes(ix[:8 * n]); s["index"]["ts"].frombytes(ix[8 * n:])
+                s["index"]["scan"], s["disk"] = s["size"], (e["seg"], e["off"], e["len"])
+            self._insert(s)
+        elif sid not in self.lru:
+            return
+        elif op == "append":
+            self._grow(self.lru[sid], self.log.read(e["seg"], e["off"], e["len"]).decode("utf-8"), e["version"])
+        elif op == "close":
+            self.lru[sid]["live"], self.lru[sid]["version"] = False, e["version"]
+            self._ready(self.lru[sid])
+        elif op == "drop":
+            self._drop(sid, logged=True)
+
+    def _insert(self, s: dict):
+        self.lru[s["id"]] = s
+        self.order[s["id"]] = None
+        self.devices.setdefault(s["device_name"], OrderedDict())[s["id"]] = None
+        self.nbytes += s["size"] + s["blob_bytes"]
+        if s.get("hash"): self.hashes[s["hash"]] = s["id"]
+        if s.get("key"):  self.keys[s["key"]] = s["id"]
+        if not s["live"]: self._ready(s)
+
+    def _ready(self, s: dict):
+        if self.on_ready: self.on_ready(s)
+
+    def add(self, content: str, device_name: Optional[str] = None,
+            sampling_rate: Optional[int] = None, duration_val: Optional[int] = None,
+            live: bool = False, blobs: Optional[dict] = None, data: Optional[bytes] = None,
+            digest: Optional[str] = None, key: Optional[str] = None) -> dict:
+        """`data` is `content` as UTF-8 when the caller already has the bytes.  With a
+        content `digest` or idempotency `key` already held, nothing is stored and the
+        existing session comes back with duplicate=True — unless the key holds other
+        content, which is a 409."""
+        s = {
+            "id":            uuid.uuid4().hex,
+            "content":       content,
+            "device_name":   device_name,
+            "sampling_rate": sampling_rate,
+            "duration_val":  duration_val,
+            "size":          len(content),
+            "received_at":   time.time(),
+            "live":          live,
+            "blobs":         dict(blobs or {}),  # (kind, encoding) → compressed bytes
+            "index":         new_index(),
+            "hash":          digest,
+            "key":           key,
+        }
+        extend_index(s["index"], content)
+        s["blob_bytes"] = sum(map(len, s["blobs"].values()))
+        if live: s["parts"] = [content]     # appended pieces, joined lazily on read
+        data = (content.encode("utf-8") if data is None else data) if self.log else b""
+        with self.lock, self._change():
+            held = self.keys.get(key) or self.hashes.get(digest)
+            if held is not None:
+                if digest and held == self.keys.get(key) and self.lru[held].get("hash") != digest:
+                    raise HTTPException(status_code=409, detail="Idempotency-Key was used for different content")
+                return self.lru[held] | {"duplicate": True}
+            self.version += 1
+            s["version"] = self.version
+            if self.log:
+                e = {k: s[k] for k in ("id", "device_name", "sampling_rate", "duration_val",
+                                       "size", "received_at", "live", "version", "hash", "key")}
+                self.log.append(e | {"op": "add", "len": len(data), "records": len(s["index"]["off"])},
+                                data, s["index"]["off"].tobytes(), s["index"]["ts"].tobytes())
+            self._insert(s)
+            while len(self.lru) > 1 and (len(self.lru) > self.max_sessions or self.nbytes > self.max_bytes):
+                self._drop(next(iter(self.lru)))
+        return s
+
+    def _drop(self, sid: str, logged: bool = False):
+        """Remove a session; logged=True when replaying another worker's drop."""
+        s = self.lru.pop(sid)
+        del self.order[sid]
+        ids = self.devices[s["device_name"]]
+        del ids[sid]
+        if not ids: del self.devices[s["device_name"]]
+        self.nbytes -= s["size"] + s["blob_bytes"]
+        if self.hashes.get(s.get("hash")) == sid: del self.hashes[s["hash"]]
+        if self.keys.get(s.get("key")) == sid:    del self.keys[s["key"]]
+        if self.log:
+            if not logged: self.log.append({"op": "drop", "id": sid})
+            self.log.release(sid, delete=not logged)
+
+    def _grow(self, s: dict, text: str, version: int):
+        s["parts"].append(text)
+        extend_index(s["index"], text)
+        s["content"] = None
+        s["size"]   += len(text)
+        s["version"] = version
+        self.nbytes += len(text) - s["blob_bytes"]
+        s["blobs"], s["blob_bytes"] = {}, 0
+        self.lru.move_to_end(s["id"])
+
+    def append(self, sid: str, text: str) -> Optional[dict]:
+        """Append to a live session — O(len(text)), earlier data is never copied."""
+        with self.lock, self._change():
+            s = self.lru.get(sid)
+            if s is None or not s["live"]: return s
+            self.version += 1
+            if self.log:
+                data = text.encode("utf-8")
+                self.log.append({"op": "append", "id": sid, "len": len(data), "version": self.version}, data)
+            self._grow(s, text, self.version)
+            return s
+
+    def close(self, sid: str) -> Optional[dict]:
+        with self.lock, self._change():
+            s = self.lru.get(sid)
+            if s is not None and s["live"]:
+                self.version += 1
+                s["live"], s["version"] = False, self.version
+                if self.log: self.log.append({"op": "close", "id": sid, "version": self.version})
+                self._ready(s)
+            return s
+
+    def _view(self, s: dict) -> dict:
+        if s["content"] is None and "disk" in s:
+            s["content"] = self.log.read(*s["disk"]).decode("utf-8")
+        if "parts" in s and s["content"] is None:
+            s["content"] = "".join(s["parts"])
+            s["parts"]   = [s["content"]]
+        return {k: v for k, v in s.items() if k not in PRIVATE} | derived(s)
+
+    def get(self, sid: str) -> Optional[dict]:
+        with self.lock:
+            self._sync()
+            s = self.lru.get(sid)
+            if s is None: return None
+            self.lru.move_to_end(sid)
+            return self._view(s)
+
+    def info(self, sid: str) -> Optional[dict]:
+        """Metadata only — never joins or serialises the content."""
+        with self.lock:
+            self._sync()
+            s = self.lru.get(sid)
+            if s is None: return None
+            self.lru.move_to_end(sid)
+            return meta(s)
+
+    def held(self, digest: Optional[str] = None, key: Optional[str] = None) -> Optional[dict]:
+        """The session stored under this content hash or idempotency key, if any."""
+        with self.lock:
+            self._sync()
+            sid = self.keys.get(key) or self.hashes.get(digest)
+            return None if sid is None else self.lru[sid]
+
+    def poll(self) -> int:
+        """Pick up other workers' log entries; the store version after that."""
+        with self.lock:
+            self._sync()
+            return self.version
+
+    def latest(self, device_name: Optional[str] = None) -> Optional[dict]:
+        sid = self.latest_id(device_name)
+        return None if sid is None else self.get(sid)
+
+    def latest_id(self, device_name: Optional[str] = None) -> Optional[str]:
+        with self.lock:
+            self._sync()
+            ids = self.order if device_name is None else self.devices.get(device_name)
+            return next(reversed(ids)) if ids else None
+
+    def encoded(self, sid: str, kind: str, enc: Optional[str]):
+        """(session view, body bytes) — body is the JSON document or the raw TXT,
+        compressed with `enc`; compressed bodies are cached until the next append."""
+        with timed("store"), self.lock:
+            self._sync()
+            s = self.lru.get(sid)
+            if s is None: return None, None
+            self.lru.move_to_end(sid)
+            view, ver = self._view(s), s["version"]
+            blob = s["blobs"].get((kind, enc)) if enc else None
+        if blob is None:
+            with timed("serialize"):
+                blob = (json.dumps(view, ensure_ascii=False, separators=(",", ":")) if kind == "json"
+                        else view["content"]).encode("utf-8")
+                if enc: blob = encode_body(blob, enc)
+            if enc:
+                with self.lock:
+                    if s["version"] == ver and sid in self.lru and (kind, enc) not in s["blobs"]:
+                        s["blobs"][(kind, enc)] = blob
+                        s["blob_bytes"] += len(blob)
+                        self.nbytes     += len(blob)
+        return view, blob
+
+    def window(self, sid: str, start: Optional[int] = None, end: Optional[int] = None,
+               offset: int = 0, limit: Optional[int] = None):
+        """(session view, first, stop, text) for records [first, stop): those stamped
+        within [start, end], then paged by offset/limit.  Only the slice is copied."""
+        with self.lock:
+            self._sync()
+            s = self.lru.get(sid)
+            if s is None: return None, 0, 0, None
+            self.lru.move_to_end(sid)
+            off, ts = s["index"]["off"], s["index"]["ts"]
+            lo = 0        if start is None else bisect.bisect_left(ts, start)
+            hi = len(off) if end   is None else bisect.bisect_right(ts, end)
+            first = min(lo + offset, hi)
+            stop  = hi if limit is None else min(first + limit, hi)
+            view  = self._view(s)
+            a, b  = (off[first] if first < stop else 0), (off[stop] if stop < len(off) else None)
+        return view, first, stop, view["content"][a:b] if first < stop else ""
+
+    def parse(self, sid: str):
+        """Build the session's column table (worker thread); dropped if the session changed meanwhile."""
+        with self.lock:
+            s = self.lru.get(sid)
+            if s is None or s["live"] or "table" in s: return
+            text, ver = self._view(s)["content"], s["version"]
+        try:
+            table = parse_table(text)
+            table["pyramid"] = build_pyramid(table["Time"], table["values"])
+            nb    = table["Time"].nbytes + table["exact"].nbytes + table["values"].nbytes + sum(
+                    lv[k].nbytes for lv in table["pyramid"] for k in ("Time", "min", "max", "mean"))
+        except Exception:
+            table, nb = None, 0             # recorded, so readers stop waiting for it
+        with self.lock:
+            if s["version"] == ver and sid in self.lru:
+                s["table"] = table
+                s["blob_bytes"] += nb
+                self.nbytes     += nb
+
+    def table(self, sid: str):
+        """(session meta, done, table) — table is None when parsing failed."""
+        with self.lock:
+            self._sync()
+            s = self.lru.get(sid)
+            if s is None: return None, False, None
+            self.lru.move_to_end(sid)
+            return meta(s), "table" in s, s.get("table")
+
+    def list(self, device_name: Optional[str] = None) -> list:
+        with self.lock:
+            self._sync()
+            ids = self.order if device_name is None else self.devices.get(device_name, {})
+            return [meta(self.lru[sid]) for sid in reversed(ids)]
+
+    def device_list(self) -> list:
+        with self.lock:
+            self._sync()
+            return [{"device_name": d, "sessions": len(ids), "latest_id": next(reversed(ids))}
+                    for d, ids in self.devices.items()]
+
+    def since(self, after: int, device_name: Optional[str] = None) -> list:
+        """Complete sessions changed after store version `after`, oldest change first."""
+        with self.lock:
+            self._sync()
+            return sorted((s for s in self.lru.values() if not s["live"] and s["version"] > after
+                           and device_name in (None, s["device_name"])), key=lambda s: s["version"])
+
+    def stats(self) -> tuple:
+        """(sessions held, store bytes, TXT bytes per device)."""
+        with self.lock:
+            self._sync()
+            per_device = {}
+            for s in self.lru.values():
+                per_device[s["device_name"]] = per_device.get(s["device_name"], 0) + s["size"]
+            return len(self.lru), self.nbytes, per_device
+
+store = SessionStore(MAX_SESSIONS, MAX_BYTES, SegmentLog(DATA_DIR, SEGMENT_MB * 2**20) if DATA_DIR else None)
+
+PRIVATE = ("parts", "blobs", "blob_bytes", "index", "table", "disk", "key")
+
+def derived(s: dict) -> dict:
+    return {"records": len(s["index"]["off"]), "parsed": s.get("table") is not None}
+
+def meta(s: dict) -> dict:
+    return {k: v for k, v in s.items() if k != "content" and k not in PRIVATE} | derived(s)
+
+parse_queue = queue.Queue()                 # session ids waiting for parse-on-ingest
+queued      = set()
+
+def _parse_worker():
+    while True:
+        sid = parse_queue.get()
+        store.parse(sid)
+        queued.discard(sid)
+
+def schedule_parse(sid: str):
+    if parse_arrays is not None and sid not in queued:
+        queued.add(sid)
+        parse_queue.put(sid)
+
+if parse_arrays is not None:
+    threading.Thread(target=_parse_worker, name="parse-on-ingest", daemon=True).start()
+
+# ── Session events ────────────────────────────────────────────
+# "Session available" notices for GET /events (server-sent events).
+# The store reports each session that becomes complete — uploaded,
+# finalised or closed, by this worker or (via _sync) another — and the
+# hub fans it out to per-subscriber asyncio queues on the event loop.
+# The SSE id is "epoch:version" — the store version within this server
+# run — so a reconnect with Last-Event-ID replays what was missed, and
+# a client that sees a new epoch (restart with a fresh store) in the
+# opening "hello" event knows its old cursor means nothing here.
+# While anyone is subscribed, a poll task picks up other workers' log
+# entries every EVENT_POLL seconds.
+EVENT_POLL      = 0.5
+EVENT_KEEPALIVE = 15.0
+EVENT_DEPTH     = 256                       # per subscriber; the oldest is dropped when full
+
+def event(s: dict) -> dict:
+    return {"id": s["id"], "device_name": s["device_name"], "sampling_rate": s["sampling_rate"],
+            "records": len(s["index"]["off"]), "size": s["size"], "version": s["version"],
+            "received_at": s["received_at"], "epoch": store.epoch}
+
+class EventHub:
+    def __init__(self):
+        self.subs, self.loop, self.poller = set(), None, None
+
+    def publish(self, s: dict):
+        """Called by the store with its lock held, from any thread."""
+        if self.subs and self.loop: self.loop.call_soon_threadsafe(self._fan, event(s))
+
+    def _fan(self, ev: dict):
+        for q in self.subs:
+            if q.full(): q.get_nowait()
+            q.put_nowait(ev)
+
+    def subscribe(self) -> asyncio.Queue:
+        self.loop = asyncio.get_running_loop()
+        q = asyncio.Queue(EVENT_DEPTH)
+        self.subs.add(q)
+        if store.log and (self.poller is None or self.poller.done()):
+            self.poller = asyncio.create_task(self._poll())
+        return q
+
+    async def _poll(self):
+        while self.subs:
+            await asyncio.to_thread(store.poll)
+            await asyncio.sleep(EVENT_POLL)
+
+hub = EventHub()
+store.on_ready = hub.publish
+
+# ── Conditional GET ───────────────────────────────────────────
+# Every add/append/close stamps the session with the next store-wide
+# version; the ETag pairs it with the session id, so it stays unique
+# across restarts.  Clients send it back in If-None-Match (a list is
+# fine) and get an empty 304 while nothing has changed.
+def etag(s: dict) -> str:
+    return f'"{s["id"]}-{s["version"]}"'
+
+def not_modified(request: Request, tag: str) -> bool:
+    sent = request.headers.get("if-none-match")
+    if not sent: return False
+    tags = {t.strip().removeprefix("W/") for t in sent.split(",")}
+    return "*" in tags or tag in tags
+
+def cache_headers(s: dict) -> dict:
+    return {"ETag": etag(s), "Cache-Control": "no-cache", "Vary": "Accept-Encoding", "X-Session-Id": s["id"]}
+
+def encoded_response(request: Request, sid: str, kind: str, window: Optional[tuple] = None) -> Response:
+    """Session as JSON or raw TXT; `window` = (start, end, offset, limit) serves a record range."""
+    enc = pick_encoding(request.headers.get("accept-encoding", ""))
+    if window is None:
+        with timed("store"): info = store.info(sid)
+        if info is None:
+            raise HTTPException(status_code=404, detail="Unknown or evicted session")
+        if not_modified(request, etag(info)):
+            return Response(status_code=304, headers=cache_headers(info))
+        view, body = store.encoded(sid, kind, enc)
+        if view is None:
+            raise HTTPException(status_code=404, detail="Unknown or evicted session")
+        headers = cache_headers(view)
+    else:
+        with timed("store"): view, first, stop, piece = store.window(sid, *window)
+        if view is None:
+            raise HTTPException(status_code=404, detail="Unknown or evicted session")
+        headers = cache_headers(view) | {"ETag": f'{etag(view)[:-1]}-{first}-{stop}"',
+                                         "X-Record-Offset": str(first), "X-Record-Count": str(stop - first),
+                                         "X-Total-Records": str(view["records"])}
+        if not_modified(request, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        with timed("serialize"):
+            body = (json.dumps(view | {"content": piece, "size": len(piece), "offset": first, "count": stop - first},
+                               ensure_ascii=False, separators=(",", ":")) if kind == "json" else piece).encode("utf-8")
+            if enc: body = encode_body(body, enc)
+    if enc: headers["Content-Encoding"] = enc
+    if kind == "json":
+        return Response(body, media_type="application/json", headers=headers)
+    for k in ("device_name", "sampling_rate", "duration_val"):
+        if view[k] is not None: headers[f"X-{k.replace('_', '-').title()}"] = str(view[k])
+    return Response(body, media_type="text/plain; charset=utf-8", headers=headers)
+
+def record_window(start: Optional[str], end: Optional[str], offset: int, limit: Optional[int]) -> Optional[tuple]:
+    """Query parameters → window tuple, or None when the whole session is wanted."""
+    if offset < 0 or (limit is not None and limit < 0):
+        raise HTTPException(status_code=422, detail="offset and limit must be >= 0")
+    if start is None and end is None and not offset and limit is None: return None
+    return (None if start is None else parse_when(start),
+            None if end   is None else parse_when(end), offset, limit)
+
+EMPTY = {"content": None, "device_name": None, "sampling_rate": None, "duration_val": None}
+
+# ── Deduplication ─────────────────────────────────────────────
+# Finished uploads are keyed by the blake2b-128 of their TXT bytes (the
+# converter's txt_key) and, when the client sends one, an Idempotency-Key.
+# A repeat of either is acknowledged with the held session's id and
+# duplicate=True; nothing is stored twice and no new session event fires.
+# A key that already holds different content is a 409, on every path.
+# POST /uploads takes content_hash up front, so a device can skip
+# sending a body the server already has.
+def txt_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def received(s: dict) -> dict:
+    dup = s.get("duplicate", False)
+    if not dup: schedule_parse(s["id"])
+    return {"status": "duplicate" if dup else "received", "id": s["id"], "duplicate": dup}
+
+def replayed(key: Optional[str], digest: Optional[str] = None) -> Optional[dict]:
+    """The response for a repeated Idempotency-Key, or None when the key is new."""
+    s = store.held(key=key) if key else None
+    if s is None: return None
+    if digest and s.get("hash") != digest:
+        raise HTTPException(status_code=409, detail="Idempotency-Key was used for different content")
+    return received(s | {"duplicate": True})
+
+def as_text(raw: bytes) -> tuple:
+    """(str, bytes for the log) — the bytes are reused only if they are valid UTF-8."""
+    try:    return raw.decode("utf-8"), raw
+    except UnicodeDecodeError:
+        return raw.decode("utf-8", errors="replace"), None
+
 @app.post("/upload")
-def upload_txt(data: TXTData):
-    latest_txt_data["content"]       = data.content
-    latest_txt_data["device_name"]   = data.device_name
-    latest_txt_data["sampling_rate"] = data.sampling_rate
-    latest_txt_data["duration_val"]  = data.duration_val
-    return {"status": "received"}
+def upload_txt(data: TXTData, idempotency_key: Optional[str] = Header(None)):
+    raw = data.content.encode("utf-8")
+    digest = txt_hash(raw)
+    done = replayed(idempotency_key, digest)
+    if done: return done
+    with timed("store"):
+        s = store.add(data.content, data.device_name, data.sampling_rate, data.duration_val,
+                      data=raw, digest=digest, key=idempotency_key)
+    return received(s)
+
+# Raw-body variant: the TXT is the request body (text/plain or
+# application/octet-stream, Content-Encoding gzip/zstd allowed) and the
+# metadata comes as query parameters or X-Device-Name / X-Sampling-Rate /
+# X-Duration headers.  The body is read on the event loop and decoded
+# once; there is no JSON string to unescape and no pydantic copy, and the
+# received bytes go to the segment log as they are.  Identity bodies are
+# hashed chunk by chunk as they arrive.
+@app.post("/upload/raw")
+async def upload_raw(request: Request, device_name: Optional[str] = None,
+                     sampling_rate: Optional[int] = None, duration_val: Optional[int] = None,
+                     x_device_name: Optional[str] = Header(None), x_sampling_rate: Optional[int] = Header(None),
+                     x_duration: Optional[int] = Header(None), idempotency_key: Optional[str] = Header(None)):
+    with timed("validate"):
+        if request.headers.get("content-encoding", "identity") == "identity":
+            h, parts = hashlib.blake2b(digest_size=16), []
+            async for chunk in request.stream():
+                h.update(chunk)
+                parts.append(chunk)
+            raw, digest = b"".join(parts), h.hexdigest()
+            del parts
+        else:
+            raw = await request.body()
+            digest = txt_hash(raw)
+        content, data = as_text(raw)
+    if idempotency_key:
+        done = await run_in_threadpool(replayed, idempotency_key, digest)
+        if done: return done
+
+    def ingest():
+        with timed("store"):
+            return store.add(content, device_name or x_device_name, sampling_rate or x_sampling_rate,
+                             duration_val or x_duration, data=data, digest=digest, key=idempotency_key)
+    return received(await run_in_threadpool(ingest))
+
+# ── Bulk upload ───────────────────────────────────────────────
+# Backfills send many sessions in one POST /upload/bulk: newline-delimited
+# /upload documents (NDJSON, gzip/zstd allowed).  Lines are split and
+# validated as the body streams in and each is committed on its own,
+# deduplicated like /upload, so a bad record costs only its own line.
+# The response has one status per non-empty line, in order.
+async def ndjson_lines(request: Request, limit: int):
+    """(line number, bytes) per line of the body; bytes is None for a line over `limit`."""
+    decode, buf, scan, n, skip = stream_decoder(request.headers.get("content-encoding")), bytearray(), 0, 0, False
+    async for chunk in request.stream():
+        try:    buf += decode(chunk)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Malformed compressed body")
+        start = 0
+        while (i := buf.find(b"\n", scan)) >= 0:
+            n += 1
+            if not skip: yield n, bytes(buf[start:i]) if i - start <= limit else None
+            start = scan = i + 1
+            skip = False
+        del buf[:start]
+        scan = len(buf)
+        if not skip and len(buf) > limit:
+            yield n + 1, None
+            skip = True
+        if skip: buf.clear(); scan = 0
+    if buf and not skip:
+        yield n + 1, bytes(buf)
+
+@app.post("/upload/bulk")
+async def upload_bulk(request: Request):
+    items = []
+
+    def commit(line: bytes) -> dict:
+        data = TXTData.model_validate_json(line)
+        raw  = data.content.encode("utf-8")
+        with timed("store"):
+            return received(store.add(data.content, data.device_name, data.sampling_rate, data.duration_val,
+                                      data=raw, digest=txt_hash(raw)))
+
+    try:
+        async for n, line in ndjson_lines(request, BULK_LINE_MAX):
+            if line is None:
+                items.append({"line": n, "status": "error", "detail": f"Line exceeds {BULK_LINE_MAX} bytes"})
+            elif line.strip():
+                try:    items.append({"line": n} | await run_in_threadpool(commit, line))
+                except ValidationError as e:
+                    err = e.errors()[0]
+                    items.append({"line": n, "status": "error",
+                                  "detail": f"{'.'.join(map(str, err['loc'])) or 'line'}: {err['msg']}"})
+    except ClientDisconnect:
+        pass                                # committed lines stay; the client can resend the rest
+    count = lambda st: sum(i["status"] == st for i in items)
+    return {"items": items, "received": count("received"), "duplicates": count("duplicate"), "errors": count("error")}
+
+# ── Chunked / resumable upload ────────────────────────────────
+# POST /uploads → id · PUT /uploads/{id}?offset=N (raw body, streamed to
+# disk) · GET /uploads/{id} → acknowledged offset · POST …/finalize.
+# A PUT at the wrong offset gets 409 + the offset to resume from.  All
+# state is on disk — {id}.part holds the bytes (its size is the offset,
+# an flock on it marks a PUT in flight) and {id}.json the metadata — so
+# any worker can take the next chunk.
+def _part(uid: str) -> str:
+    if not uid.isalnum():
+        raise HTTPException(status_code=404, detail="Unknown or expired upload")
+    return os.path.join(UPLOAD_DIR, f"{uid}.part")
+
+def _pending(uid: str) -> dict:
+    path = _part(uid)
+    try:
+        with open(path[:-5] + ".json", encoding="utf-8") as f:
+            u = json.load(f)
+        u["offset"] = os.path.getsize(path)
+    except (OSError, ValueError):
+        raise HTTPException(status_code=404, detail="Unknown or expired upload")
+    return u | {"path": path}
+
+@contextmanager
+def _claim(uid: str):
+    """The upload's part file, opened for append and flocked — None if another PUT holds it."""
+    f = open(_pending(uid)["path"], "ab")
+    try:
+        try:    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield None
+            return
+        yield f
+    finally:
+        f.close()
+
+def _expire():
+    now = time.time()
+    for name in os.listdir(UPLOAD_DIR):
+        if not name.endswith(".json"): continue
+        base = os.path.join(UPLOAD_DIR, name[:-5])
+        try:
+            if now - os.path.getmtime(base + ".part") <= UPLOAD_TTL: continue
+            with open(base + ".part", "ab") as f:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                os.remove(base + ".json"); os.remove(base + ".part")
+        except OSError: pass                # busy, or already gone
+
+@app.post("/uploads")
+def open_upload(m: UploadMeta, encoding: str = "identity", content_hash: Optional[str] = None,
+                idempotency_key: Optional[str] = Header(None)):
+    if encoding not in ("identity",) + ENCODINGS:
+        raise HTTPException(status_code=415, detail=f"Unsupported encoding: {encoding}")
+    if content_hash:                        # without one, a held key is checked at finalize
+        done = replayed(idempotency_key, content_hash)
+        if done: return done
+        s = store.held(content_hash)
+        if s is not None: return received(s | {"duplicate": True})
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    _expire()
+    uid  = uuid.uuid4().hex
+    path = os.path.join(UPLOAD_DIR, f"{uid}.part")
+    open(path, "wb").close()
+    with open(path[:-5] + ".json", "w", encoding="utf-8") as f:
+        json.dump({"meta": m.model_dump(), "enc": encoding, "key": idempotency_key}, f)
+    return {"upload_id": uid, "offset": 0}
+
+@app.get("/uploads/{uid}")
+def upload_status(uid: str):
+    return {"upload_id": uid, "offset": _pending(uid)["offset"]}
+
+@app.put("/uploads/{uid}")
+async def append_chunk(uid: str, offset: int, request: Request):
+    with _claim(uid) as f:
+        at = _pending(uid)["offset"]
+        if f is None or offset != at:
+            return JSONResponse({"upload_id": uid, "offset": at}, status_code=409)
+        try:
+            async for chunk in request.stream():
+                await run_in_threadpool(f.write, chunk)
+                at += len(chunk)
+        except ClientDisconnect:
+            pass                            # keep what arrived; client resumes from offset
+    return {"upload_id": uid, "offset": at}
+
+@app.post("/uploads/{uid}/finalize")
+def finalize_upload(uid: str, size: Optional[int] = None):
+    with _claim(uid) as f:
+        u = _pending(uid)
+        if f is None or (size is not None and size != u["offset"]):
+            return JSONResponse({"upload_id": uid, "offset": u["offset"]}, status_code=409)
+        with open(u["path"], "rb") as r:
+            raw = r.read()
+        os.remove(u["path"]); os.remove(u["path"][:-5] + ".json")
+    txt   = decode_body(raw, u["enc"])
+    blobs = {("txt", u["enc"]): raw} if u["enc"] != "identity" else None   # serve as received
+    content, data = as_text(txt)
+    m = UploadMeta(**u["meta"])
+    with timed("store"):
+        s = store.add(content, m.device_name, m.sampling_rate, m.duration_val, blobs=blobs,
+                      data=data, digest=txt_hash(txt), key=u.get("key"))
+    return received(s)
+
+# ── Live sessions ─────────────────────────────────────────────
+# A streaming device opens a live session, then POSTs small text/plain
+# batches of records over one keep-alive connection; readers see the
+# session grow in place (GET /latest, /sessions/{id}) until it is closed.
+@app.post("/live")
+def open_live(m: UploadMeta):
+    s = store.add("", m.device_name, m.sampling_rate, m.duration_val, live=True)
+    return {"status": "open", "id": s["id"]}
+
+@app.post("/live/{sid}/append")
+async def append_live(sid: str, request: Request):
+    text = (await request.body()).decode("utf-8", errors="replace")
+    s = await run_in_threadpool(store.append, sid, text)     # takes the store lock and the log flock
+    if s is None:
+        raise HTTPException(status_code=404, detail="Unknown or evicted session")
+    if not s["live"]:
+        raise HTTPException(status_code=409, detail="Session is closed")
+    return {"id": sid, "size": s["size"]}
+
+@app.post("/live/{sid}/close")
+def close_live(sid: str):
+    s = store.close(sid)
+    if s is None:
+        raise HTTPException(status_code=404, detail="Unknown or evicted session")
+    schedule_parse(sid)
+    return {"status": "closed", "id": sid, "size": s["size"]}
 
 @app.get("/latest")
-def get_latest():
-    return latest_txt_data
+def get_latest(request: Request, device_name: Optional[str] = None):
+    sid = store.latest_id(device_name)
+    return EMPTY if sid is None else encoded_response(request, sid, "json")
+
+@app.get("/latest/meta")
+def get_latest_meta(request: Request, device_name: Optional[str] = None):
+    """Id, version, ETag and metadata of the latest session — no content."""
+    sid  = store.latest_id(device_name)
+    info = None if sid is None else store.info(sid)
+    if info is None:
+        return {k: None for k in ("id", "version", "etag", "device_name", "sampling_rate", "duration_val")}
+    headers = cache_headers(info)
+    if not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse({**info, "etag": headers["ETag"]}, headers=headers)
+
+@app.get("/latest/content")
+def get_latest_content(request: Request, device_name: Optional[str] = None):
+    sid = store.latest_id(device_name)
+    if sid is None:
+        raise HTTPException(status_code=404, detail="No sessions yet")
+    return encoded_response(request, sid, "txt")
+
+@app.get("/sessions")
+def list_sessions(device_name: Optional[str] = None):
+    return store.list(device_name)
+
+# start/end (ISO 8601 or the TXT's own "M/D/YYYY h:mm:ss AM") select records
+# by timestamp, inclusive; offset/limit then page through that range.
+@app.get("/sessions/{sid}")
+def get_session(request: Request, sid: str, start: Optional[str] = None, end: Optional[str] = None,
+                offset: int = 0, limit: Optional[int] = None):
+    return encoded_response(request, sid, "json", record_window(start, end, offset, limit))
+
+@app.get("/sessions/{sid}/content")
+def get_session_content(request: Request, sid: str, start: Optional[str] = None, end: Optional[str] = None,
+                        offset: int = 0, limit: Optional[int] = None):
+    return encoded_response(request, sid, "txt", record_window(start, end, offset, limit))
+
+@app.get("/devices")
+def list_devices():
+    return store.device_list()
+
+def _missed(after: int, device_name: Optional[str]) -> list:
+    return [event(s) for s in store.since(after, device_name)]
+
+@app.get("/events")
+async def session_events(request: Request, device_name: Optional[str] = None):
+    """Server-sent "session" events, one per session that becomes available to fetch."""
+    epoch, _, last = request.headers.get("last-event-id", "").partition(":")
+    after = int(last) if epoch == store.epoch and last.isdigit() else None
+
+    async def stream():
+        q = hub.subscribe()
+        try:
+            version = await asyncio.to_thread(store.poll)
+            yield f"retry: 3000\nevent: hello\ndata: {json.dumps({'epoch': store.epoch, 'version': version})}\n\n"
+            sent = set()
+            if after is not None:
+                for ev in await asyncio.to_thread(_missed, after, device_name):
+                    sent.add((ev["id"], ev["version"]))
+                    yield f"id: {store.epoch}:{ev['version']}\nevent: session\ndata: {json.dumps(ev)}\n\n"
+            while True:
+                try:    ev = await asyncio.wait_for(q.get(), EVENT_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if device_name in (None, ev["device_name"]) and (ev["id"], ev["version"]) not in sent:
+                    yield f"id: {store.epoch}:{ev['version']}\nevent: session\ndata: {json.dumps(ev)}\n\n"
+        finally:
+            hub.subs.discard(q)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ── Column table ──────────────────────────────────────────────
+# format=arrow → Arrow IPC stream (Time as timestamp[s], float32 columns,
+# zero-copy out of the stored arrays); format=npy → one structured .npy.
+# 202 + Retry-After while the session is still being parsed.
+def parsed_table(sid: str):
+    """(session meta, table) — or (meta, 202 response) while the table is not built yet."""
+    if parse_arrays is None:
+        raise HTTPException(status_code=501, detail="Parsed tables need numpy and pandas on the server")
+    info, done, table = store.table(sid)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Unknown or evicted session")
+    if not done:
+        if not info["live"]: schedule_parse(sid)     # restored from disk → parsed on first ask
+        return info, JSONResponse({"id": sid, "status": "live" if info["live"] else "parsing"},
+                                  status_code=202, headers={"Retry-After": "1"})
+    if table is None:
+        raise HTTPException(status_code=422, detail="Session could not be parsed")
+    return info, table
+
+@app.get("/sessions/{sid}/table")
+def get_session_table(request: Request, sid: str, format: str = "arrow"):
+    if format not in ("arrow", "npy"):
+        raise HTTPException(status_code=422, detail="format must be arrow or npy")
+    if format == "arrow" and pa is None:
+        raise HTTPException(status_code=501, detail="arrow tables need pyarrow on the server")
+    info, table = parsed_table(sid)
+    if isinstance(table, Response): return table
+    headers = cache_headers(info) | {"ETag": f'{etag(info)[:-1]}-{format}"'}
+    if not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if format == "arrow":
+        cols = ([pa.array(table["Time"], pa.timestamp("s"), mask=~table["exact"])]
+                + [pa.array(c) for c in table["values"]])
+        tbl  = pa.Table.from_arrays(cols, names=["Time"] + TABLE_COLS)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, tbl.schema) as w:
+            w.write_table(tbl)
+        return Response(sink.getvalue().to_pybytes(), media_type="application/vnd.apache.arrow.stream", headers=headers)
+    rec = np.empty(len(table["Time"]), dtype=[("Time", "<i8")] + [(c, "<f4") for c in TABLE_COLS])
+    rec["Time"] = table["Time"]
+    for c, v in zip(TABLE_COLS, table["values"]): rec[c] = v
+    buf = io.BytesIO()
+    np.save(buf, rec)
+    return Response(buf.getvalue(), media_type="application/octet-stream", headers=headers)
+
+# ── Chart series ──────────────────────────────────────────────
+# The pyramid level with at most `width` buckets (raw records when the
+# session already fits); cols defaults to Parameter-1/2/3 × X/Y/Z.  The
+# ETag names the session version, width and columns (as table indices).
+def _floats_json(a) -> list:
+    return [None if v != v else v for v in np.round(a.astype(np.float64), 6).tolist()]
+
+@app.get("/sessions/{sid}/series")
+def get_session_series(request: Request, sid: str, width: int = 800, cols: Optional[str] = None):
+    names = CHART_COLS if cols is None else [c.strip() for c in cols.split(",") if c.strip()]
+    bad   = [c for c in names if c not in TABLE_COLS]
+    if bad or width < 1:
+        raise HTTPException(status_code=422, detail=f"Unknown column(s): {', '.join(bad)}" if bad else "width must be >= 1")
+    info, table = parsed_table(sid)
+    if isinstance(table, Response): return table
+    rows    = [TABLE_COLS.index(c) for c in names]
+    headers = cache_headers(info) | {"ETag": f'{etag(info)[:-1]}-series-{width}-{".".join(map(str, rows))}"'}
+    if not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    level = next((lv for lv in table["pyramid"] if len(lv["Time"]) <= width), None)
+    if len(table["Time"]) <= width or not table["pyramid"]:
+        v     = table["values"][rows]
+        level = {"bucket": 1, "Time": table["Time"], "min": v, "max": v, "mean": v}
+    elif level is None:
+        level = table["pyramid"][-1]
+    def pick(k): return level[k] if level["bucket"] == 1 else level[k][rows]
+    lo, hi, mean = pick("min"), pick("max"), pick("mean")
+    return JSONResponse({
+        "id": sid, "bucket": level["bucket"], "points": len(level["Time"]), "records": info["records"],
+        "time": level["Time"].tolist(),
+        "series": {c: {"min": _floats_json(lo[i]), "max": _floats_json(hi[i]), "mean": _floats_json(mean[i])}
+                   for i, c in enumerate(names)},
+    }, headers=headers)
+
+# ── /metrics ──────────────────────────────────────────────────
+# Counters, histograms and the ingest/parse gauges are per process, so
+# with a shared data dir every worker also writes a snapshot of them to
+# metrics/<pid>.json every METRICS_FLUSH seconds.  A scrape of any
+# worker returns the series of all live workers, labelled worker="<pid>"
+# (sum them in PromQL); snapshots of exited workers are removed.  The
+# store gauges describe the shared store and carry no worker label.
+METRICS_FLUSH = 1.0
+
+def _snapshot() -> dict:
+    with REQ_LOCK: reqs = [[*k, n] for k, n in REQUESTS.items()]
+    return {"requests": reqs, "hist": {h.name: h.snapshot() for h in HISTOGRAMS},
+            "ingest": [gate.active, gate.bytes], "parse_queue": parse_queue.qsize()}
+
+def _publish_metrics():
+    root, last = os.path.join(DATA_DIR, "metrics"), None
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, f"{os.getpid()}.json")
+    while True:
+        time.sleep(METRICS_FLUSH)
+        snap = _snapshot()
+        if snap == last: continue
+        try:
+            with open(path + ".tmp", "w") as f: json.dump(snap, f)
+            os.replace(path + ".tmp", path)
+            last = snap
+        except OSError: pass
+
+def _workers() -> dict:
+    """pid → snapshot for every live worker; this one's is taken now."""
+    me  = str(os.getpid())
+    out = {me: _snapshot()}
+    root = os.path.join(DATA_DIR, "metrics") if DATA_DIR else None
+    for name in sorted(os.listdir(root)) if root and os.path.isdir(root) else ():
+        pid, path = name[:-5], os.path.join(root, name)
+        if not name.endswith(".json") or not pid.isdigit() or pid == me: continue
+        try:    os.kill(int(pid), 0)
+        except ProcessLookupError:
+            try:    os.remove(path)
+            except OSError: pass
+            continue
+        except PermissionError: pass        # alive, owned by another user
+        try:
+            with open(path) as f: out[pid] = json.load(f)
+        except (OSError, ValueError): pass
+    return dict(sorted(out.items()))
+
+if DATA_DIR:
+    threading.Thread(target=_publish_metrics, name="metrics-publish", daemon=True).start()
+
+@app.get("/metrics")
+def metrics():
+    held, total, per_device = store.stats()
+    workers = _workers()
+    out = ["# HELP pump_requests_total Requests by route, method and status.", "# TYPE pump_requests_total counter"]
+    out += [f'pump_requests_total{{route="{prom_label(r)}",method="{m}",status="{c}",worker="{w}"}} {n}'
+            for w, snap in workers.items() for r, m, c, n in sorted(snap["requests"])]
+    for h in HISTOGRAMS:
+        out += h.render(("route", "method"), {w: snap["hist"].get(h.name, []) for w, snap in workers.items()})
+    out += ["# HELP pump_sessions Sessions held by the store.", "# TYPE pump_sessions gauge", f"pump_sessions {held}",
+            "# HELP pump_store_bytes Store size incl. cached encodings and tables.", "# TYPE pump_store_bytes gauge",
+            f"pump_store_bytes {total}",
+            "# HELP pump_stored_bytes TXT bytes held per device.", "# TYPE pump_stored_bytes gauge"]
+    out += [f'pump_stored_bytes{{device="{prom_label(d)}"}} {n}' for d, n in per_device.items()]
+    out += ["# HELP pump_ingest_inflight Ingest requests admitted and not finished.", "# TYPE pump_ingest_inflight gauge"]
+    out += [f'pump_ingest_inflight{{worker="{w}"}} {snap["ingest"][0]}' for w, snap in workers.items()]
+    out += ["# HELP pump_ingest_bytes Declared body bytes of admitted ingest requests.", "# TYPE pump_ingest_bytes gauge"]
+    out += [f'pump_ingest_bytes{{worker="{w}"}} {snap["ingest"][1]}' for w, snap in workers.items()]
+    out += ["# HELP pump_parse_queue Sessions waiting for parse-on-ingest.", "# TYPE pump_parse_queue gauge"]
+    out += [f'pump_parse_queue{{worker="{w}"}} {snap["parse_queue"]}' for w, snap in workers.items()]
+    return Response("\n".join(out) + "\n", media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,201 @@
+"""
+SessionStore over a shared data dir (two stores on one SegmentLog
+directory stand in for two uvicorn workers), and parse-on-ingest
+against the converter.
+
+    cd API && python -m pytest -q
+"""
+import os, sys, time
+from datetime import datetime
+
+os.environ["PUMP_DATA_DIR"] = ""            # the module-level store stays in memory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Device"))
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from api_server import SegmentLog, SessionStore, app
+from converter import parse_57, table_frame
+from generator import generate_txt
+
+
+def txt(seed: int) -> str:
+    return generate_txt("pump", 60, 1, seed=seed, start_time=datetime(2024, 1, 1, 8, 0, 0))[0]
+
+
+@pytest.fixture
+def stores(tmp_path):
+    a = SessionStore(100, 2**30, SegmentLog(str(tmp_path), 2**20))
+    b = SessionStore(100, 2**30, SegmentLog(str(tmp_path), 2**20))
+    return a, b
+
+
+def test_add_visible_in_other_store(stores):
+    a, b = stores
+    assert a.epoch == b.epoch
+    s = a.add(txt(1), "pump-1", 60, 1)
+    assert b.latest_id() == s["id"] == b.latest_id("pump-1")
+    got = b.get(s["id"])
+    assert got["content"] == txt(1) and got["records"] == 60
+    assert [m["id"] for m in b.list()] == [s["id"]]
+    assert b.device_list() == [{"device_name": "pump-1", "sessions": 1, "latest_id": s["id"]}]
+    assert b.stats() == (1, len(txt(1)), {"pump-1": len(txt(1))})
+
+
+def test_duplicate_across_stores(stores):
+    a, b = stores
+    s = a.add(txt(2), "pump-1", 60, 1, digest="d2", key="k2")
+    assert b.held(key="k2")["id"] == s["id"]
+    dup = b.add(txt(2), "pump-2", 60, 1, digest="d2")
+    assert dup["duplicate"] and dup["id"] == s["id"]
+    assert len(a.list()) == len(b.list()) == 1
+
+
+def test_live_session_and_since(stores):
+    a, b = stores
+    done = a.add(txt(3), "pump-1", 60, 1)
+    live = b.add("", "pump-2", 60, 1, live=True)
+    mark = a.poll()
+    assert [s["id"] for s in a.since(0)] == [done["id"]]      # live sessions are not announced
+    b.append(live["id"], txt(4))
+    b.close(live["id"])
+    assert [s["id"] for s in a.since(mark)] == [live["id"]]
+    assert [s["id"] for s in a.since(0, "pump-1")] == [done["id"]]
+    assert a.get(live["id"])["content"] == txt(4)
+
+
+def test_eviction_drops_in_other_store(tmp_path):
+    a = SessionStore(1, 2**30, SegmentLog(str(tmp_path), 2**20))
+    b = SessionStore(1, 2**30, SegmentLog(str(tmp_path), 2**20))
+    first  = a.add(txt(5), "pump-1", 60, 1)
+    second = a.add(txt(6), "pump-1", 60, 1)
+    assert b.get(first["id"]) is None
+    assert b.latest_id() == second["id"] and b.stats()[0] == 1
+
+
+# ── Parse on ingest ───────────────────────────────────────────
+LEGACY = """3/9/2024 1:05:00 PM
+X Axis:
+RMS: 0.12
+PP 0.95
+Kurtosis 1.3
+Peak 1 Freq 25 Mag -31.5
+Peak 2 Freq x Mag -40.25
+Y Axis:
+Parameter-1: 0.5
+Parameter-2
+Peak 8 Freq 120 Mag -23
+Z Axis:
+RMS 0.2
+"""
+
+RAW_TIME = "#Vibration Value\n13/45/2024 10:00:00 AM\nX Axis:\nParameter-1 1.0\n"
+
+
+def table(client, body: str):
+    sid = client.post("/upload", json={"content": body, "device_name": "pump-t"}).json()["id"]
+    for _ in range(100):
+        resp = client.get(f"/sessions/{sid}/table")
+        if resp.status_code != 202: break
+        time.sleep(0.05)
+    assert resp.status_code == 200
+    return table_frame(resp.content)
+
+
+@pytest.mark.parametrize("body", [txt(7), LEGACY, txt(8) + LEGACY], ids=["generated", "headerless", "mixed"])
+def test_table_matches_converter(body):
+    with TestClient(app) as client:
+        got = table(client, body)
+    pd.testing.assert_frame_equal(got, parse_57(body), check_dtype=False)
+
+
+def test_table_with_raw_time_defers_to_text():
+    with TestClient(app) as client:
+        assert table(client, txt(9) + RAW_TIME) is None
+
+
+# ── Idempotency-Key ───────────────────────────────────────────
+def chunked(client, body: bytes, key: str, content_hash: str = None):
+    params = {"content_hash": content_hash} if content_hash else {}
+    r = client.post("/uploads", params=params, json={"device_name": "pump-k"}, headers={"Idempotency-Key": key})
+    if "upload_id" not in r.json(): return r
+    uid = r.json()["upload_id"]
+    client.put(f"/uploads/{uid}", params={"offset": 0}, content=body)
+    return client.post(f"/uploads/{uid}/finalize", params={"size": len(body)})
+
+
+def test_reused_key_with_other_content_is_409():
+    from api_server import txt_hash
+    with TestClient(app) as client:
+        first = client.post("/upload", json={"content": "DDD"}, headers={"Idempotency-Key": "k2"}).json()
+        assert chunked(client, b"CCC", "k2").status_code == 409                        # caught at finalize
+        assert chunked(client, b"CCC", "k2", txt_hash(b"CCC")).status_code == 409      # caught at open
+        again = chunked(client, b"DDD", "k2", txt_hash(b"DDD")).json()
+        assert again["duplicate"] and again["id"] == first["id"]
+        assert chunked(client, b"DDD", "k2").json()["id"] == first["id"]
+
+
+# ── Ingest gate ───────────────────────────────────────────────
+def test_finalize_reserves_part_size():
+    import api_server
+    body = txt(10).encode()
+    with TestClient(app) as client:
+        uid = client.post("/uploads", json={"device_name": "pump-g"}).json()["upload_id"]
+        client.put(f"/uploads/{uid}", params={"offset": 0}, content=body)
+        seen = []
+        leave = api_server.gate.leave
+        api_server.gate.leave = lambda n, secs: (seen.append(n), leave(n, secs))
+        try:
+            assert api_server.gate.enter(api_server.gate.budget - len(body) + 1)     # someone else's upload
+            try:     r = client.post(f"/uploads/{uid}/finalize")
+            finally: leave(api_server.gate.budget - len(body) + 1, 1.0)
+            assert r.status_code == 429 and r.headers["Retry-After"]
+            assert client.post(f"/uploads/{uid}/finalize").status_code == 200
+        finally:
+            api_server.gate.leave = leave
+        assert seen == [len(body)]
+
+
+# ── Series ETag ───────────────────────────────────────────────
+def test_series_etag_per_representation():
+    with TestClient(app) as client:
+        sid = client.post("/upload", json={"content": txt(11), "device_name": "pump-s"}).json()["id"]
+        for _ in range(100):
+            r = client.get(f"/sessions/{sid}/series", params={"width": 10})
+            if r.status_code == 200: break
+            time.sleep(0.05)
+        tag = r.headers["ETag"]
+        assert client.get(f"/sessions/{sid}/series", params={"width": 10},
+                          headers={"If-None-Match": tag}).status_code == 304
+        assert client.get(f"/sessions/{sid}/series", params={"width": 20},
+                          headers={"If-None-Match": tag}).status_code == 200
+        assert client.get(f"/sessions/{sid}/series", params={"width": 10, "cols": "Parameter-4_X"},
+                          headers={"If-None-Match": tag}).status_code == 200
+        session_tag = client.get(f"/sessions/{sid}").headers["ETag"]
+        assert client.get(f"/sessions/{sid}/series", params={"width": 10},
+                          headers={"If-None-Match": session_tag}).status_code == 200
+
+
+# ── Metrics ───────────────────────────────────────────────────
+def test_metrics_cover_every_worker(tmp_path, monkeypatch):
+    import json, subprocess
+    import api_server
+    monkeypatch.setattr(api_server, "DATA_DIR", str(tmp_path))
+    (tmp_path / "metrics").mkdir()
+    other = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    dead  = subprocess.Popen([sys.executable, "-c", "pass"]); dead.wait()
+    snap  = {"requests": [["/devices", "GET", 200, 7]], "hist": {}, "ingest": [1, 2], "parse_queue": 0}
+    try:
+        for p in (other.pid, dead.pid):
+            (tmp_path / "metrics" / f"{p}.json").write_text(json.dumps(snap))
+        with TestClient(app) as client:
+            client.post("/upload", json={"content": "x", "device_name": 'a"b\\c\nd é'})
+            text = client.get("/metrics").text
+    finally:
+        other.kill(); other.wait()
+    assert f'pump_requests_total{{route="/devices",method="GET",status="200",worker="{other.pid}"}} 7' in text
+    assert f'pump_ingest_inflight{{worker="{other.pid}"}} 1' in text
+    assert f'worker="{os.getpid()}"' in text and f'worker="{dead.pid}"' not in text
+    assert not (tmp_path / "metrics" / f"{dead.pid}.json").exists()
+    assert 'pump_stored_bytes{device="a\\"b\\\\c\\nd é"} 1' in text
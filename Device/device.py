@@ -1,10 +1,15 @@
 import streamlit as st
-import random
 import time
 import json
+import random
 import requests
 from datetime import datetime, timedelta
-from io import StringIO
+
+import gzip
+import hashlib
+import numpy as np
+
+from generator import generate_txt, estimate_file_size_kb, render_records
 
 # ─── Page Config ────────────────────────────────────────────────────────────────
 st.set_page_config(
@@ -469,60 +474,194 @@ if "records_count" not in st.session_state:
 if "time_range" not in st.session_state:
     st.session_state.time_range = ("", "")
 
-# ─── Data Generation Logic ───────────────────────────────────────────────────────
-def gen_axis_block(axis_name: str) -> str:
-    lines = [f"{axis_name}:"]
-    # Parameter-20 (stable baseline, 2 decimal places)
-    if axis_name == "X Axis":
-        p20 = round(random.uniform(-6, -5), 2)
-    elif axis_name == "Y Axis":
-        p20 = round(random.uniform(0.08, 0.12), 2)
-    else:
-        p20 = round(random.uniform(7.9, 8.1), 2)
-    lines.append(f"Parameter-20 {p20}")
-    # Noise parameters (2 decimal places)
-    lines.append(f"Parameter-1 {round(random.uniform(0.05, 0.2), 2)}")
-    lines.append(f"Parameter-2 {round(random.uniform(0.3, 1.5), 2)}")
-    lines.append(f"Parameter-3 {round(random.uniform(-0.3, 1.5), 2)}")
-    # Peaks 1–8 — each peak is a SINGLE line
-    for i in range(1, 9):
-        param_a = 4 + (i - 1) * 2   # 4,6,8,10,12,14,16,18
-        param_b = 5 + (i - 1) * 2   # 5,7,9,11,13,15,17,19
-        val_a = random.randint(10, 120)
-        val_b = round(random.uniform(-45, -23), 2)
-        lines.append(f"Peak {i} Parameter-{param_a} {val_a} Parameter-{param_b} {val_b}")
-    return "\n".join(lines)
-
-
-def generate_txt(device_name: str, sampling_rate: int, duration_hours: int) -> tuple[str, int]:
-    total_records = int((duration_hours * 3600) / sampling_rate)
-    start_time = datetime.now()
-    buffer = StringIO()
-
-    for i in range(total_records):
-        ts = start_time + timedelta(seconds=i * sampling_rate)
-        # Format: M/D/YYYY H:MM:SS AM/PM (no leading zeros, cross-platform Windows safe)
-        month = str(ts.month)
-        day   = str(ts.day)
-        hour  = str(ts.hour % 12 or 12)
-        ampm  = "AM" if ts.hour < 12 else "PM"
-        ts_str = f"{month}/{day}/{ts.year} {hour}:{ts.strftime('%M')}:{ts.strftime('%S')} {ampm}"
-        buffer.write("#Vibration Value\n")
-        buffer.write(f"{ts_str} \n")
-        buffer.write(gen_axis_block("X Axis"))
-        buffer.write("\n\n")
-        buffer.write(gen_axis_block("Y Axis"))
-        buffer.write("\n\n")
-        buffer.write(gen_axis_block("Z Axis"))
-        buffer.write("\n\n")
-
-    return buffer.getvalue(), total_records
-
-
-def estimate_file_size_kb(duration_hours: int, sampling_rate: int) -> float:
-    records = (duration_hours * 3600) / sampling_rate
-    # ~420 bytes per record approximate
-    return round(records * 420 / 1024, 1)
+# ─── Upload Logic ────────────────────────────────────────────────────────────────
+try:
+    import zstandard               # optional — zstd is ~3× faster than gzip at a similar ratio
+except ImportError:
+    zstandard = None
+
+API_BASE      = "https://pumpdata.duckdns.org/api"
+UPLOAD_ENC    = "zstd" if zstandard else "gzip"
+CHUNK_BYTES   = 64 * 1024          # size of each piece yielded to the request body
+WINDOW_BYTES  = 1024 * 1024        # bytes sent per PUT before the server acknowledges
+MAX_RETRIES   = 6                  # consecutive failed or refused (409/429) requests before giving up
+LIVE_FLUSH_S  = 5                  # live mode: records are batched into one write per ~5 s
+
+
+def compress(data: bytes, enc: str) -> bytes:
+    if enc == "zstd": return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def iter_chunks(data: bytes, start: int, stop: int):
+    for i in range(start, stop, CHUNK_BYTES):
+        yield data[i:min(i + CHUNK_BYTES, stop)]
+
+
+def backoff_delay(fails: int, retry_after: str = None) -> float:
+    """Full-jitter exponential backoff, never sooner than the server's Retry-After."""
+    try:    floor = float(retry_after or 0)
+    except ValueError: floor = 0.0
+    return max(floor, random.uniform(0, min(2 ** fails, 30)))
+
+
+def backoff(fails: int, retry_after: str = None):
+    time.sleep(backoff_delay(fails, retry_after))
+
+
+def retryable(e: requests.exceptions.RequestException) -> bool:
+    """Worth another try: no response (connection, timeout), 429 or a 5xx."""
+    return e.response is None or e.response.status_code == 429 or e.response.status_code >= 500
+
+
+def send_chunked(data: bytes, meta: dict, on_progress=None) -> dict:
+    """Resumable upload: open → PUT windows at the acknowledged offset → finalize.
+    The TXT is compressed once (UPLOAD_ENC) and offsets refer to the compressed
+    bytes.  Each window is streamed from a generator; after a dropped connection
+    the server is asked for its offset and sending resumes from there.  A
+    busy server (429), or an upload still held by an earlier PUT (409), gets
+    the window (or the finalize) again after a jittered backoff.
+    The content hash goes first: if the server already holds this TXT (a
+    second click, a retry after a timeout) no body is sent at all.  An upload
+    id the server no longer knows (404) was either committed by a finalize
+    whose response was lost or expired; opening again with the hash tells
+    which, and an expired upload starts over."""
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def open_upload() -> dict:
+        resp = requests.post(f"{API_BASE}/uploads", params={"encoding": UPLOAD_ENC, "content_hash": digest},
+                             json=meta, timeout=15)
+        resp.raise_for_status()
+        return resp.json()
+
+    up = open_upload()
+    if up.get("duplicate"):
+        return up
+    data = compress(data, UPLOAD_ENC)
+    uid, off, fails = up["upload_id"], 0, 0
+    while True:
+        try:
+            if off is None:
+                resp = requests.get(f"{API_BASE}/uploads/{uid}", timeout=15)
+                if resp.status_code == 404:
+                    up = open_upload()
+                    if up.get("duplicate"):
+                        return up
+                    uid, off = up["upload_id"], 0
+                    continue
+                resp.raise_for_status()
+                off = resp.json()["offset"]
+            if off >= len(data):
+                resp = requests.post(f"{API_BASE}/uploads/{uid}/finalize",
+                                     params={"size": len(data)}, timeout=30)
+                if resp.status_code == 404:
+                    off = None; continue
+                if resp.status_code in (409, 429) and fails < MAX_RETRIES:
+                    fails += 1
+                    backoff(fails, resp.headers.get("Retry-After"))
+                    if resp.status_code == 409: off = resp.json()["offset"]
+                    continue
+                resp.raise_for_status()
+                return resp.json()
+            resp = requests.put(
+                f"{API_BASE}/uploads/{uid}", params={"offset": off},
+                data=iter_chunks(data, off, min(off + WINDOW_BYTES, len(data))),
+                timeout=(10, 60),
+            )
+            if resp.status_code == 404:
+                off = None; continue
+            if resp.status_code in (409, 429) and fails < MAX_RETRIES:
+                # 409: another PUT (e.g. one that timed out on our side) still holds the upload
+                fails += 1
+                backoff(fails, resp.headers.get("Retry-After"))
+                if resp.status_code == 409: off = resp.json()["offset"]
+                continue
+            resp.raise_for_status()
+            off, fails = resp.json()["offset"], 0
+            if on_progress: on_progress(off / len(data))
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            fails += 1
+            if fails > MAX_RETRIES:
+                raise
+            backoff(fails)
+            off = None
+
+
+def stream_live(meta: dict, sampling_rate: int, duration_hours: int,
+                seed: int | None = None, on_tick=None) -> str:
+    """Live mode: emit one record every `sampling_rate` s to /live/{id}/append.
+    One keep-alive Session carries every write; a failed write keeps its batch
+    and is retried with the next one, so no records are dropped.  After a
+    connection error, 429 or 5xx the next write waits out a jittered backoff
+    (records keep accumulating meanwhile); a session the server no longer
+    has (404 evicted, 409 closed) is reopened.  Any other HTTP error, or
+    MAX_RETRIES consecutive failures, ends the stream with that error."""
+    http  = requests.Session()
+    hdrs  = {"Content-Type": "text/plain; charset=utf-8", "Content-Encoding": UPLOAD_ENC}
+    rng   = np.random.default_rng(seed)
+    total = int((duration_hours * 3600) / sampling_rate)
+    every = max(1, LIVE_FLUSH_S // sampling_rate)
+    buf, t_next, fails, hold = [], time.monotonic(), 0, 0.0
+
+    def open_live() -> str:
+        resp = http.post(f"{API_BASE}/live", json=meta, timeout=15)
+        resp.raise_for_status()
+        return resp.json()["id"]
+
+    def append() -> requests.Response:
+        return http.post(f"{API_BASE}/live/{sid}/append",
+                         data=compress("".join(buf).encode("utf-8"), UPLOAD_ENC), headers=hdrs, timeout=15)
+
+    def flush() -> bool:
+        """Send buf; on failure keep it, set the backoff and return False."""
+        nonlocal sid, fails, hold
+        try:
+            resp = append()
+            if resp.status_code in (404, 409):
+                sid  = open_live()
+                resp = append()
+            resp.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            fails += 1
+            if fails > MAX_RETRIES or not retryable(e):
+                raise
+            hold = time.monotonic() + backoff_delay(
+                fails, e.response.headers.get("Retry-After") if e.response is not None else None)
+            return False
+        buf.clear()
+        fails = 0
+        return True
+
+    sid  = open_live()
+    done = False
+    try:
+        for i in range(total):
+            time.sleep(max(0.0, t_next - time.monotonic()))
+            t_next += sampling_rate
+            buf.append(render_records(rng, datetime.now(), sampling_rate, 1))
+            if (len(buf) >= every or i == total - 1) and time.monotonic() >= hold:
+                flush()
+            if on_tick: on_tick(i + 1, total)
+        while buf and not flush():
+            time.sleep(max(0.0, hold - time.monotonic()))
+        while True:
+            try:
+                http.post(f"{API_BASE}/live/{sid}/close", timeout=15).raise_for_status()
+                break
+            except requests.exceptions.RequestException as e:
+                fails += 1
+                if fails > MAX_RETRIES or not retryable(e):
+                    raise
+                backoff(fails, e.response.headers.get("Retry-After") if e.response is not None else None)
+        done = True
+    finally:
+        if not done:                        # leaving on an error: best effort, never masks it
+            try:
+                if buf: append()
+                http.post(f"{API_BASE}/live/{sid}/close", timeout=15)
+            except requests.exceptions.RequestException:
+                pass
+    return sid
 
 
 # ─── Header ─────────────────────────────────────────────────────────────────────
@@ -588,6 +727,12 @@ duration_hours = st.selectbox(
 )
 duration_val = int(duration_hours.split()[0])
 
+seed_str = st.text_input(
+    "Random Seed (optional)",
+    placeholder="Leave blank for random data",
+    key="seed_input",
+)
+
 # File size estimate
 est_kb = estimate_file_size_kb(duration_val, sampling_rate)
 est_str = f"{est_kb:.0f} KB" if est_kb < 1024 else f"{est_kb/1024:.2f} MB"
@@ -620,6 +765,7 @@ st.markdown('</div>', unsafe_allow_html=True)
 start_col, _ = st.columns([1, 0.01])
 with start_col:
     start_clicked = st.button("▶  Start Data Collection", key="start_btn", use_container_width=True)
+    live_clicked  = st.button("◉  Stream Live to Processing Service", key="live_btn", use_container_width=True)
 
 # ─── Simulation Logic ─────────────────────────────────────────────────────────────
 if start_clicked:
@@ -645,26 +791,12 @@ if start_clicked:
         </div>
         """, unsafe_allow_html=True)
 
-        prog_bar = st.progress(0)
-        pct_text = st.empty()
-        STEPS = 20
-
-        for step in range(STEPS + 1):
-            pct = step / STEPS
-            prog_bar.progress(pct)
-            pct_text.markdown(
-                f'<p style="text-align:center;font-family:var(--mono);font-size:0.75rem;'
-                f'color:var(--accent);letter-spacing:0.1em;">'
-                f'{int(pct * 100)}% — Sampling sensor channels…</p>',
-                unsafe_allow_html=True,
-            )
-            time.sleep(1)
-
-        pct_text.empty()
-
         # Generate actual data
-        txt_data, num_records = generate_txt(device_name.strip(), sampling_rate, duration_val)
+        seed = int(seed_str) if seed_str.strip().lstrip("-").isdigit() else None
         start_ts = datetime.now()
+        with st.spinner("Sampling sensor channels…"):
+            txt_data, num_records = generate_txt(device_name.strip(), sampling_rate, duration_val,
+                                                 seed=seed, start_time=start_ts)
         end_ts   = start_ts + timedelta(hours=duration_val)
 
         st.session_state.generated_data = txt_data
@@ -677,6 +809,42 @@ if start_clicked:
         )
         st.rerun()
 
+# ─── Live Streaming ──────────────────────────────────────────────────────────────
+if live_clicked:
+    if not device_name.strip():
+        st.markdown('<div class="warn-banner">⚠ Device Name is required before starting collection.</div>', unsafe_allow_html=True)
+    else:
+        st.session_state.device_status = "collecting"
+        st.button("■  Stop Live Stream", key="stop_live_btn", use_container_width=True)   # click → rerun stops the loop
+        live_bar = st.progress(0.0)
+        live_txt = st.empty()
+
+        def _tick(n, total):
+            live_bar.progress(n / total)
+            live_txt.markdown(
+                f'<p style="text-align:center;font-family:var(--mono);font-size:0.75rem;'
+                f'color:var(--accent);letter-spacing:0.1em;">'
+                f'{n:,} / {total:,} records streamed — next in {sampling_rate}s</p>',
+                unsafe_allow_html=True,
+            )
+
+        try:
+            stream_live(
+                {"device_name": device_name.strip(), "sampling_rate": sampling_rate, "duration_val": duration_val},
+                sampling_rate, duration_val,
+                seed=int(seed_str) if seed_str.strip().lstrip("-").isdigit() else None,
+                on_tick=_tick,
+            )
+            st.markdown("""
+            <div class="success-banner">
+                <div class="success-icon">📡</div>
+                <div class="success-text">Live session complete — all records delivered</div>
+            </div>
+            """, unsafe_allow_html=True)
+        except requests.exceptions.RequestException as e:
+            st.markdown(f'<div class="warn-banner">⚠ Live stream failed: {e}. Please retry.</div>', unsafe_allow_html=True)
+        st.session_state.device_status = "idle"
+
 # ─── Results Section ─────────────────────────────────────────────────────────────
 if st.session_state.generation_done and st.session_state.generated_data:
     t_start, t_end = st.session_state.time_range
@@ -723,28 +891,29 @@ if st.session_state.generation_done and st.session_state.generated_data:
     st.markdown('</div>', unsafe_allow_html=True)
 
     if send_clicked:
-        API_BASE = "https://pumpdata.duckdns.org/api"
         with st.spinner("Transmitting data to ingestion service…"):
+            send_bar = st.progress(0.0)
             try:
-                resp = requests.post(
-                    f"{API_BASE}/upload",
-                    json={
-                        "content":       st.session_state.generated_data,
+                res = send_chunked(
+                    st.session_state.generated_data.encode("utf-8"),
+                    {
                         "device_name":   device_name.strip(),
                         "sampling_rate": sampling_rate,
                         "duration_val":  duration_val,
                     },
-                    timeout=30,
+                    on_progress=send_bar.progress,
                 )
-                if resp.status_code == 200:
-                    st.markdown("""
-                    <div class="success-banner">
-                        <div class="success-icon">📡</div>
-                        <div class="success-text">Data successfully sent to processing service</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    st.markdown(f'<div class="warn-banner">⚠ Server returned status {resp.status_code}. Please retry.</div>', unsafe_allow_html=True)
+                send_bar.empty()
+                msg = ("Already received by processing service — nothing re-sent" if res.get("duplicate")
+                       else "Data successfully sent to processing service")
+                st.markdown(f"""
+                <div class="success-banner">
+                    <div class="success-icon">📡</div>
+                    <div class="success-text">{msg}</div>
+                </div>
+                """, unsafe_allow_html=True)
+            except requests.exceptions.HTTPError as e:
+                st.markdown(f'<div class="warn-banner">⚠ Server returned status {e.response.status_code}. Please retry.</div>', unsafe_allow_html=True)
             except requests.exceptions.ConnectionError:
                 st.markdown('<div class="warn-banner">⚠ Could not reach processing service. Check that the server is running and retry.</div>', unsafe_allow_html=True)
             except requests.exceptions.Timeout:
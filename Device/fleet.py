@@ -0,0 +1,123 @@
+"""
+Fleet load generator  ·  N virtual devices → API
+Each virtual device has its own name and sampling rate (5/10/15/30 s) and
+uploads a generated session on a fixed schedule over one shared async
+HTTP client.  Prints throughput, p50/p95/p99 latency and error rates.
+
+    cd API && uvicorn api_server:app --port 8000 --workers 1
+    python fleet.py --url http://127.0.0.1:8000 --devices 200 --interval 30 --run 120
+    python fleet.py --raw …            # same, via the raw-body POST /upload/raw
+    python fleet.py --repeat-body …    # every device re-sends one session: dedup path
+"""
+import argparse, asyncio, json, random, sys, time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from generator import generate_txt
+
+try:
+    import httpx
+except ImportError:
+    sys.exit("fleet.py needs httpx  —  pip install httpx")
+
+RATES = (5, 10, 15, 30)
+
+
+class Stats:
+    def __init__(self):
+        self.lat, self.sent_bytes = [], 0
+        self.errors = Counter()
+
+    def add(self, secs: float, nbytes: int, err: str = None):
+        if err: self.errors[err] += 1
+        else:   self.lat.append(secs); self.sent_bytes += nbytes
+
+    def report(self, elapsed: float) -> str:
+        ok, bad = len(self.lat), sum(self.errors.values())
+        p = np.percentile(self.lat, [50, 95, 99]) * 1000 if ok else (np.nan,) * 3
+        lines = [
+            f"requests  {ok + bad:,}  ·  ok {ok:,}  ·  errors {bad:,} ({bad / max(ok + bad, 1):.1%})",
+            f"throughput  {ok / elapsed:.1f} req/s  ·  {self.sent_bytes / elapsed / 2**20:.2f} MB/s",
+            f"latency ms  p50 {p[0]:.0f}  ·  p95 {p[1]:.0f}  ·  p99 {p[2]:.0f}"
+            + (f"  ·  max {max(self.lat) * 1000:.0f}" if ok else ""),
+        ]
+        lines += [f"  {n:>6,}  {e}" for e, n in self.errors.most_common()]
+        return "\n".join(lines)
+
+
+def session_body(name: str, rate: int, hours: int, seed, start: datetime, raw: bool) -> bytes:
+    txt, _ = generate_txt(name, rate, hours, seed=seed, start_time=start)
+    if raw: return txt.encode()
+    return json.dumps({"content": txt, "device_name": name, "sampling_rate": rate, "duration_val": hours}).encode()
+
+
+async def device(client: httpx.AsyncClient, name: str, rate: int, seed, a, stop: float, stats: Stats):
+    """One virtual pump: upload a session every `a.interval` s until `stop` (never overlapping itself).
+    Each send covers the next `a.hours` of data, so its content is new (dedup would short-circuit a
+    repeat) — unless --repeat-body.  With --raw the TXT goes to /upload/raw, otherwise /upload JSON."""
+    params = {"device_name": name, "sampling_rate": rate, "duration_val": a.hours} if a.raw else None
+    start  = datetime(2024, 1, 1)
+    body   = await asyncio.to_thread(session_body, name, rate, a.hours, seed, start, a.raw)
+    nxt    = time.perf_counter() + random.uniform(0, a.interval)
+    while True:
+        await asyncio.sleep(max(0.0, nxt - time.perf_counter()))
+        if time.perf_counter() >= stop: return
+        t0 = time.perf_counter()
+        try:
+            if params:
+                r = await client.post("/upload/raw", content=body, params=params,
+                                      headers={"Content-Type": "text/plain"})
+            else:
+                r = await client.post("/upload", content=body, headers={"Content-Type": "application/json"})
+            stats.add(time.perf_counter() - t0, len(body), None if r.status_code == 200 else f"HTTP {r.status_code}")
+        except httpx.HTTPError as e:
+            stats.add(time.perf_counter() - t0, 0, type(e).__name__)
+        nxt += a.interval
+        if not a.repeat_body:
+            start += timedelta(hours=a.hours)
+            body = await asyncio.to_thread(session_body, name, rate, a.hours, seed, start, a.raw)
+
+
+async def run(a):
+    rng   = random.Random(a.seed)
+    fleet = [(f"{a.prefix}-{i + 1:03d}", rng.choice(RATES), None if a.seed is None else a.seed + i)
+             for i in range(a.devices)]
+    print(f"{a.devices} devices · {a.hours} h of data per upload", flush=True)
+
+    stats  = Stats()
+    limits = httpx.Limits(max_connections=a.connections, max_keepalive_connections=a.connections)
+    async with httpx.AsyncClient(base_url=a.url, limits=limits, timeout=a.timeout) as client:
+        t0   = time.perf_counter()
+        stop = t0 + a.run
+        tasks = [asyncio.create_task(device(client, n, r, sd, a, stop, stats)) for n, r, sd in fleet]
+        pending = set(tasks)
+        while pending:
+            _, pending = await asyncio.wait(pending, timeout=5)
+            done = len(stats.lat) + sum(stats.errors.values())
+            print(f"  t+{time.perf_counter() - t0:5.0f}s  {done:,} requests", flush=True)
+        elapsed = time.perf_counter() - t0
+    print(stats.report(elapsed))
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Simulate a fleet of pumps uploading to the API.")
+    ap.add_argument("--url", default="http://127.0.0.1:8000", help="API base URL")
+    ap.add_argument("-n", "--devices", type=int, default=50, help="virtual devices")
+    ap.add_argument("--hours", type=int, default=1, help="hours of data per uploaded session")
+    ap.add_argument("--interval", type=float, default=30.0, help="seconds between uploads per device")
+    ap.add_argument("--run", type=float, default=60.0, help="test duration in seconds")
+    ap.add_argument("--connections", type=int, default=100, help="max pooled HTTP connections")
+    ap.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    ap.add_argument("--prefix", default="PUMP", help="device name prefix")
+    ap.add_argument("--repeat-body", action="store_true",
+                    help="re-send each device's first session (exercises duplicate detection)")
+    ap.add_argument("--raw", action="store_true", help="upload the TXT as a raw body to /upload/raw")
+    ap.add_argument("--seed", type=int, default=None, help="seed for reproducible fleets")
+    asyncio.run(run(ap.parse_args(argv)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
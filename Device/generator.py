@@ -0,0 +1,78 @@
+"""
+Device simulator  ·  TXT generation engine
+Shared by the Streamlit simulator (device.py) and the headless fleet
+load generator (fleet.py).  No Streamlit imports here.
+"""
+from datetime import datetime
+
+import numpy as np
+
+
+# ─── Data Generation Logic ───────────────────────────────────────────────────────
+# All random values for all records are drawn at once from a numpy Generator,
+# timestamps come from one datetime64 epoch array, and the TXT is rendered by a
+# single %-format of a repeated record template.
+AXIS_P20 = {"X": (-6, -5), "Y": (0.08, 0.12), "Z": (7.9, 8.1)}   # Parameter-20 stable baseline
+
+
+def axis_template(axis: str) -> str:
+    lines = [f"{axis} Axis:", "Parameter-20 %r", "Parameter-1 %r", "Parameter-2 %r", "Parameter-3 %r"]
+    # Peaks 1–8 — each peak is a SINGLE line: Parameter-4,6,…,18 int · Parameter-5,7,…,19 float
+    for i in range(1, 9):
+        lines.append(f"Peak {i} Parameter-{4 + (i - 1) * 2} %d Parameter-{5 + (i - 1) * 2} %r")
+    return "\n".join(lines)
+
+
+RECORD_TEMPLATE = ("#Vibration Value\n%s \n"
+                   + "\n\n".join(axis_template(a) for a in AXIS_P20) + "\n\n")
+
+
+def axis_values(rng: np.random.Generator, axis: str, n: int) -> list:
+    """Columns of one axis block, in template order, as Python numbers (2 dp floats)."""
+    cols = [rng.uniform(*AXIS_P20[axis], n),
+            rng.uniform(0.05, 0.2, n),
+            rng.uniform(0.3, 1.5, n),
+            rng.uniform(-0.3, 1.5, n)]
+    peaks_a = rng.integers(10, 121, (8, n))
+    peaks_b = rng.uniform(-45, -23, (8, n))
+    cols = [np.round(c, 2).tolist() for c in cols]
+    for a, b in zip(peaks_a, np.round(peaks_b, 2)):
+        cols += [a.tolist(), b.tolist()]
+    return cols
+
+
+def format_timestamps(start: datetime, sampling_rate: int, n: int) -> list:
+    """M/D/YYYY H:MM:SS AM/PM (no leading zeros on M, D, H) for n samples."""
+    t    = np.datetime64(start.replace(microsecond=0), "s") + np.arange(n) * np.timedelta64(sampling_rate, "s")
+    day  = t.astype("M8[D]")
+    mon  = t.astype("M8[M]")
+    year = t.astype("M8[Y]").astype(np.int64) + 1970
+    sec  = (t - day).astype(np.int64)
+    h24  = sec // 3600
+    cols = (mon.astype(np.int64) % 12 + 1, (day - mon).astype(np.int64) + 1, year,
+            (h24 % 12 + 11) % 12 + 1, sec // 60 % 60, sec % 60)
+    ampm = np.where(h24 < 12, "AM", "PM").tolist()
+    return ["%d/%d/%d %d:%02d:%02d %s" % r for r in zip(*(c.tolist() for c in cols), ampm)]
+
+
+def render_records(rng: np.random.Generator, start: datetime, sampling_rate: int, n: int) -> str:
+    """n consecutive records starting at `start`, as TXT."""
+    cols = [format_timestamps(start, sampling_rate, n)]
+    for axis in AXIS_P20:
+        cols += axis_values(rng, axis, n)
+    flat = [v for rec in zip(*cols) for v in rec]
+    return (RECORD_TEMPLATE * n) % tuple(flat)
+
+
+def generate_txt(device_name: str, sampling_rate: int, duration_hours: int,
+                 seed: int | None = None, start_time: datetime | None = None) -> tuple[str, int]:
+    """Same seed (and start_time) → byte-identical TXT."""
+    total_records = int((duration_hours * 3600) / sampling_rate)
+    rng = np.random.default_rng(seed)
+    return render_records(rng, start_time or datetime.now(), sampling_rate, total_records), total_records
+
+
+def estimate_file_size_kb(duration_hours: int, sampling_rate: int) -> float:
+    records = (duration_hours * 3600) / sampling_rate
+    # ~420 bytes per record approximate
+    return round(records * 420 / 1024, 1)
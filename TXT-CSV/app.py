@@ -8,7 +8,8 @@ Layout : Horizontal rule–separated full-width bands
          Absolutely NO cards / boxes / shadows around content
 """
 
-import gc, re, requests
+import gc, hashlib, io, json, os, re, requests, threading, time
+from collections import deque
 from datetime import datetime
 
 import matplotlib
@@ -16,6 +17,10 @@ matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import pandas as pd
 import streamlit as st
+from urllib3.util.request import ACCEPT_ENCODING
+
+from converter import (EXPORT_FMT, LABEL_MAP, extract_meta, label_frame, parse_57, table_frame,
+                       to19, write_frame)
 
 st.set_page_config(
     page_title="Vibration Data Converter",
@@ -455,15 +460,9 @@ label { color: var(--ink-3) !important; }
 #  CONSTANTS
 # ═══════════════════════════════════════════════════════════════════════
 API_BASE  = "https://pumpdata.duckdns.org/api"
-SR_LABEL  = {5: "5 sec", 10: "10 sec", 15: "15 sec", 30: "30 sec"}
-LABEL_MAP = {
-    "Normal_Mode (0)":        0,
-    "Seal Failure (1)":       1,
-    "Bearing (2)":            2,
-    "Shaft Misalignment (3)": 3,
-    "Unbalance_impeller (4)": 4,
-    "Cavitation (5)":         5,
-}
+ACCEPT_ENC = "zstd, gzip" if "zstd" in ACCEPT_ENCODING else "gzip"   # what urllib3 can decode here
+CACHE_DIR    = os.environ.get("VDC_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "vdc"))
+CACHE_BUDGET = int(os.environ.get("VDC_CACHE_MB", "512")) * 2**20
 
 # ═══════════════════════════════════════════════════════════════════════
 #  SESSION STATE
@@ -472,182 +471,121 @@ for _k, _v in {
     "api_sessions": [],
     "fetch_msg":    None,
     "fetch_type":   None,
+    "uploads":      {},     # file_id → (txt, content key), decoded once per upload
+    "sess_out":     {},     # session name → export-ready frames (see render_session)
+    "merged":       {},     # memoised merge of sess_out
 }.items():
     if _k not in st.session_state:
         st.session_state[_k] = _v
 
+# ═══════════════════════════════════════════════════════════════════════
+#  DISK CACHE
+#  Parsed 57-feature frames are stored as Feather files named by the
+#  blake2b hash of the raw TXT, so a reopened session (new browser tab,
+#  container restart) loads without re-parsing.  Least recently used
+#  files are evicted once the directory exceeds CACHE_BUDGET bytes.
+# ═══════════════════════════════════════════════════════════════════════
+_CACHE_VER = "p57v1"                          # bump when parse_57 output changes
+
+
+def txt_key(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, f"{key}.{_CACHE_VER}.feather")
+
+
+def disk_load(key: str):
+    p = _cache_path(key)
+    try:
+        df = pd.read_feather(p)
+        os.utime(p)                           # mtime doubles as last-used stamp
+        return df
+    except: return None
+
+
+def disk_store(key: str, df: pd.DataFrame):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        p   = _cache_path(key)
+        tmp = f"{p}.{os.getpid()}.tmp"
+        df.to_feather(tmp)
+        os.replace(tmp, p)                    # atomic — readers never see a partial file
+        ents = sorted((e.stat().st_mtime, e.stat().st_size, e.path)
+                      for e in os.scandir(CACHE_DIR) if e.name.endswith(".feather"))
+        total = sum(sz for _, sz, _ in ents)
+        for _, sz, path in ents:
+            if total <= CACHE_BUDGET: break
+            try:    os.remove(path); total -= sz
+            except: pass
+    except: pass
+
+
 # ═══════════════════════════════════════════════════════════════════════
 #  CACHED PARSING  (prevents exit-132 memory crash)
+#  Keyed by content hash — the TXT itself is not re-hashed on every rerun.
+#  An API session is taken from the server's parse-on-ingest table when
+#  that table is of the very snapshot held here (its ETag is the
+#  snapshot's plus "-arrow"); a live session that has grown since, a table
+#  still being parsed or raw-text times fall back to parsing the TXT.
 # ═══════════════════════════════════════════════════════════════════════
-@st.cache_data(max_entries=8, show_spinner=False)
-def cached_parse_57(txt: str) -> pd.DataFrame:
-    rows, i = [], 0
-    lines   = [l.strip() for l in txt.splitlines() if l.strip()]
-    tre     = re.compile(r"\d+/\d+/\d+\s+\d+:\d+:\d+\s+(AM|PM)")
-    pnr     = re.compile(r"Peak\s+(\d+)\s+Parameter-\d+\s+([-\d.]+)\s+Parameter-\d+\s+([-\d.]+)")
-    por     = re.compile(r"Peak\s+(\d+)\s+Freq\s+([-\d.]+)\s+Mag\s+([-\d.]+)")
-
-    def _f(tok, j):
-        try:    return float(tok[j])
-        except: return None
-
-    while i < len(lines):
-        if tre.match(lines[i]):
-            try:    row = {"Time": datetime.strptime(lines[i].strip(), "%m/%d/%Y %I:%M:%S %p").strftime("%d/%m/%Y %H:%M:%S")}
-            except: row = {"Time": lines[i].strip()}
-            i += 1
-            for axis in ["X", "Y", "Z"]:
-                while i < len(lines) and f"{axis} Axis" not in lines[i]: i += 1
-                i += 1
-                peaks = {}
-                while i < len(lines) and not lines[i].endswith("Axis:") and not tre.match(lines[i]):
-                    line, tok = lines[i], lines[i].split()
-                    if tok and re.match(r"^Parameter-(\d+)$", tok[0]):
-                        pn = int(tok[0].split("-")[1])
-                        if   pn == 1: row[f"Parameter-1_{axis}"] = _f(tok, 1)
-                        elif pn == 2: row[f"Parameter-2_{axis}"] = _f(tok, 1)
-                        elif pn == 3: row[f"Parameter-3_{axis}"] = _f(tok, 1)
-                        i += 1; continue
-                    if   line.startswith("RMS"):     row[f"Parameter-1_{axis}"] = _f(tok, 1)
-                    elif line.startswith("PP"):       row[f"Parameter-2_{axis}"] = _f(tok, 1)
-                    elif line.startswith("Kurtosis"): row[f"Parameter-3_{axis}"] = _f(tok, 1)
-                    else:
-                        m = pnr.match(line) or por.match(line)
-                        if m: peaks[int(m.group(1))] = (float(m.group(2)), float(m.group(3)))
-                    i += 1
-                for p in range(1, 9):
-                    fp, mp = 2 + p*2, 2 + p*2 + 1
-                    row[f"Parameter-{fp}_{axis}"] = peaks.get(p, (None,None))[0]
-                    row[f"Parameter-{mp}_{axis}"] = peaks.get(p, (None,None))[1]
-            rows.append(row)
-        else:
-            i += 1
+def api_table(sid: str, etag: str):
+    try:
+        resp = requests.get(f"{API_BASE}/sessions/{sid}/table", params={"format": "arrow"}, timeout=15)
+        if resp.status_code != 200 or resp.headers.get("ETag") != f'{etag[:-1]}-arrow"': return None
+        return table_frame(resp.content)
+    except Exception: return None
 
-    cols = ["Time"]
-    for n in range(1, 4):
-        for ax in ["X","Y","Z"]: cols.append(f"Parameter-{n}_{ax}")
-    for p in range(1, 9):
-        fp, mp = 2+p*2, 2+p*2+1
-        for ax in ["X","Y","Z"]: cols.append(f"Parameter-{fp}_{ax}")
-        for ax in ["X","Y","Z"]: cols.append(f"Parameter-{mp}_{ax}")
-    df = pd.DataFrame(rows)
-    for c in cols:
-        if c not in df.columns: df[c] = pd.NA
-    return df[cols]
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def cached_parse_57(key: str, _txt: str, _sid: str = None, _etag: str = None) -> pd.DataFrame:
+    df = disk_load(key)
+    if df is None:
+        df = api_table(_sid, _etag) if _sid and _etag else None
+        if df is None: df = parse_57(_txt)
+        if not df.empty: disk_store(key, df)
+    return df
 
 
 @st.cache_data(max_entries=16, show_spinner=False)
 def cached_to19(key: str, df57: pd.DataFrame) -> pd.DataFrame:
-    rows, hl = [], "Label" in df57.columns
-    for _, row in df57.iterrows():
-        for axis in ["X","Y","Z"]:
-            nr = {"Time": row.get("Time", pd.NA)}
-            for n in range(1, 4): nr[f"Parameter-{n}"] = row.get(f"Parameter-{n}_{axis}", pd.NA)
-            for p in range(1, 9):
-                fp, mp = 2+p*2, 2+p*2+1
-                nr[f"Parameter-{fp}"] = row.get(f"Parameter-{fp}_{axis}", pd.NA)
-                nr[f"Parameter-{mp}"] = row.get(f"Parameter-{mp}_{axis}", pd.NA)
-            if hl: nr["Label"] = row["Label"]
-            rows.append(nr)
-    c19 = ["Time"] + [f"Parameter-{n}" for n in range(1, 20)]
-    d = pd.DataFrame(rows)
-    if hl: c19.append("Label")
-    return d[c19]
+    return to19(df57)
 
 # ═══════════════════════════════════════════════════════════════════════
-#  EXTRACT META FROM TXT CONTENT
-#  API only sends {"content": "..."} — no device fields in payload.
-#  Device name: supplied via manual input before fetch.
-#  Sampling rate, duration, all stats derived from TXT timestamps.
+#  LAZY EXPORT
+#  Export bytes are built only after the user asks for them and are held
+#  in this browser session alone, under (session key, window, label,
+#  format): reruns that don't touch a session never serialise it again,
+#  and the bytes are dropped once downloaded or when that tuple changes,
+#  so a merged export is never resident for longer than it is wanted.
+#  CSV is written in row chunks straight into one bytes buffer (no
+#  full-size str + encode copy); Parquet and Feather get training-ready
+#  dtypes instead of text.
 # ═══════════════════════════════════════════════════════════════════════
-def extract_meta(content: str, device_name_override: str = "",
-                 payload: dict = None) -> dict:
-    """
-    Extract session metadata.
-    Priority for each field:
-      1. API payload keys  (device_name, sampling_rate, duration_val)  ← from api_server.py
-      2. Manual text input (device_name_override)
-      3. Auto-detect from TXT timestamps
-    """
-    payload = payload or {}
-    tre  = re.compile(r"(\d+/\d+/\d+)\s+(\d+:\d+:\d+)\s+(AM|PM)")
-    ts   = tre.findall(content)
-    t_s  = f"{ts[0][0]} {ts[0][1]} {ts[0][2]}"    if ts else "—"
-    t_e  = f"{ts[-1][0]} {ts[-1][1]} {ts[-1][2]}" if ts else "—"
-    rec  = content.count("#Vibration Value")
-    sz   = round(len(content) / 1024, 1)
-
-    # ── Device name ───────────────────────────────────────────
-    # payload["device_name"] comes from device.py via api_server.py
-    dn = "—"
-    raw_dn = payload.get("device_name") or device_name_override
-    if raw_dn and str(raw_dn).strip().lower() not in ("", "none", "null", "-"):
-        dn = str(raw_dn).strip()
-
-    # ── Sampling rate ─────────────────────────────────────────
-    # payload["sampling_rate"] is the int seconds value from device.py
-    sr, sr_secs = "—", None
-    raw_sr = payload.get("sampling_rate")
-    if raw_sr is not None:
-        try:
-            sr_secs = int(raw_sr)
-            sr = SR_LABEL.get(sr_secs, f"{sr_secs} sec")
-        except: pass
-    # Fallback: auto-detect from consecutive timestamps
-    if sr_secs is None and len(ts) >= 2:
-        try:
-            fmt = "%m/%d/%Y %I:%M:%S %p"
-            d   = int(abs((
-                datetime.strptime(f"{ts[1][0]} {ts[1][1]} {ts[1][2]}", fmt) -
-                datetime.strptime(f"{ts[0][0]} {ts[0][1]} {ts[0][2]}", fmt)
-            ).total_seconds()))
-            if 1 <= d <= 300:
-                sr_secs = d
-                sr = SR_LABEL.get(d, f"{d} sec")
-        except: pass
-
-    # ── Duration ──────────────────────────────────────────────
-    # payload["duration_val"] is int hours from device.py
-    dur, dur_hours = "—", None
-    raw_dur = payload.get("duration_val")
-    if raw_dur is not None:
-        try:
-            dur_hours = int(raw_dur)
-            dur = f"{dur_hours} hour{'s' if dur_hours != 1 else ''}"
-        except: pass
-    # Fallback: compute from timestamp span
-    if dur_hours is None and len(ts) >= 2:
-        try:
-            fmt  = "%m/%d/%Y %I:%M:%S %p"
-            secs = int((
-                datetime.strptime(f"{ts[-1][0]} {ts[-1][1]} {ts[-1][2]}", fmt) -
-                datetime.strptime(f"{ts[0][0]} {ts[0][1]} {ts[0][2]}",   fmt)
-            ).total_seconds())
-            if secs > 0:
-                h, m = secs // 3600, (secs % 3600) // 60
-                dur = f"{h}h {m:02d}m" if h else f"{m}m {secs%60:02d}s"
-                dur_hours = max(1, h)
-        except: pass
-
-    # ── Derived stats ─────────────────────────────────────────
-    rph = exp_rec = completeness = "—"
-    if sr_secs:
-        rph = f"{3600 // sr_secs:,}"
-        if dur_hours:
-            exp = (dur_hours * 3600) // sr_secs
-            exp_rec = f"{exp:,}"
-            if rec > 0 and exp > 0:
-                completeness = f"{min(100.0, round(rec / exp * 100, 1))}%"
-
-    return dict(
-        device_name=dn,   sampling_rate=sr,  duration=dur,
-        records=rec,      expected_rec=exp_rec, rec_per_hour=rph,
-        completeness=completeness,
-        t_start=t_s,      t_end=t_e,
-        size_kb=sz,
-        fetched_at=datetime.now().strftime("%H:%M:%S"),
-        fetched_date=datetime.now().strftime("%d %b %Y"),
-    )
+def export_bytes(df: pd.DataFrame, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    write_frame(df, buf, fmt)
+    return buf.getvalue()
+
+
+def drop_export(key: str):
+    st.session_state.pop(f"exp_{key}", None)
+
+
+def lazy_download(label: str, sig: tuple, df: pd.DataFrame, fname: str, key: str, fmt: str = "CSV"):
+    """Prepare button first; the download button appears once the bytes exist."""
+    held = st.session_state.get(f"exp_{key}")
+    if held is not None and held[0] != (sig, fmt):
+        drop_export(key); held = None
+    if held is None:
+        if not st.button(label.replace("📥  Download", "⚙️  Prepare"),
+                         key=f"prep_btn_{key}", use_container_width=True):
+            return
+        with st.spinner(f"Building {fmt}…"):
+            held = st.session_state[f"exp_{key}"] = ((sig, fmt), export_bytes(df, fmt))
+    st.download_button(label, held[1], fname, EXPORT_FMT[fmt][1], key=key, use_container_width=True,
+                       on_click=drop_export, args=(key,))
 
 
 def hl_txt(raw: str) -> str:
@@ -668,7 +606,140 @@ def hl_txt(raw: str) -> str:
     return "<br>".join(out)
 
 
-def make_chart(df: pd.DataFrame, cols: list, title: str, pal: str) -> plt.Figure:
+@st.cache_data(max_entries=32, show_spinner=False)
+def _series(sid: str, etag: str, width: int) -> dict:
+    resp = requests.get(f"{API_BASE}/sessions/{sid}/series", params={"width": width},
+                        headers={"Accept-Encoding": ACCEPT_ENC}, timeout=15)
+    resp.raise_for_status()
+    if resp.status_code != 200:               # 202: table still being parsed
+        raise RuntimeError(f"series not ready ({resp.status_code})")
+    return resp.json()
+
+
+def api_series(sid: str, etag: str = None, width: int = 600):
+    """Server-side min/max/mean buckets for the chart columns, or None.
+    Only successes are cached (per session version), so a 202 is retried next run."""
+    try:    return _series(sid, etag, width)
+    except Exception: return None
+
+
+# ═══════════════════════════════════════════════════════════════════════
+#  API SESSIONS
+#  load_api_session() adds one /latest or /sessions/{id} payload to the
+#  loaded list — used by the fetch button and by the session feed.
+#  The feed is one background SSE subscription to /events per app process
+#  (st.cache_resource): each browser session picks up the "session"
+#  events newer than the last it saw and pulls just those sessions.
+# ═══════════════════════════════════════════════════════════════════════
+def load_api_session(payload: dict, etag: str = None, label: str = ""):
+    content = (payload.get("content") or "").strip()
+    if not content:
+        st.session_state.fetch_msg  = "No data yet — run the Device Simulator first."
+        st.session_state.fetch_type = "warning"
+        return
+    meta  = extract_meta(content, label, payload)
+    dn    = meta["device_name"] if meta["device_name"] != "—" else "Device"
+    sname = f"{dn} · {meta['fetched_date']} {meta['fetched_at']}"
+    entry = {"name": sname, "txt": content, "meta": meta,
+             "key": txt_key(content.encode("utf-8", errors="replace")),
+             "id": payload.get("id"), "etag": etag}
+    known = [i for i, s in enumerate(st.session_state.api_sessions)
+             if entry["id"] and s.get("id") == entry["id"]]
+    if known:                                 # a live session that has grown since
+        entry["name"] = st.session_state.api_sessions[known[0]]["name"]
+        st.session_state.api_sessions[known[0]] = entry
+        gc.collect()
+        st.session_state.fetch_msg  = (
+            f"Updated <strong>{entry['name']}</strong> — "
+            f"{meta['records']:,} records · {meta['size_kb']} KB"
+        )
+        st.session_state.fetch_type = "success"
+    elif sname not in [s["name"] for s in st.session_state.api_sessions]:
+        st.session_state.api_sessions.insert(0, entry)
+        gc.collect()
+        st.session_state.fetch_msg  = (
+            f"Loaded <strong>{sname}</strong> — "
+            f"{meta['records']:,} records · {meta['size_kb']} KB"
+        )
+        st.session_state.fetch_type = "success"
+    else:
+        st.session_state.fetch_msg  = f"Already loaded: {sname}"
+        st.session_state.fetch_type = "warning"
+
+
+class SessionFeed:
+    def __init__(self, url: str):
+        self.events    = deque(maxlen=64)     # newest "session" events, oldest dropped
+        self.epoch     = None                 # server run the versions below belong to
+        self.last      = 0                    # highest store version seen in that run
+        self.gen       = 0                    # bumped whenever the cursor is reset
+        self.connected = False
+        threading.Thread(target=self._run, args=(url,), name="session-feed", daemon=True).start()
+
+    def _reset(self, epoch: str):
+        self.events.clear()
+        self.epoch, self.last, self.gen = epoch, 0, self.gen + 1
+
+    def _run(self, url: str):
+        while True:
+            try:
+                hdrs = {"Accept": "text/event-stream",
+                        **({"Last-Event-ID": f"{self.epoch}:{self.last}"} if self.epoch else {})}
+                with requests.get(url, headers=hdrs, stream=True, timeout=(10, 60)) as resp:
+                    resp.raise_for_status()
+                    self.connected, kind, data = True, None, None
+                    for line in resp.iter_lines(decode_unicode=True):
+                        if line.startswith("event:"):  kind = line[6:].strip()
+                        elif line.startswith("data:"): data = json.loads(line[5:])
+                        elif not line and data is not None:
+                            if kind == "hello":
+                                # a new server run, or one whose versions went backwards:
+                                # the old cursor would hide every session until it caught up
+                                if data["epoch"] != self.epoch or data["version"] < self.last:
+                                    self._reset(data["epoch"])
+                            elif data.get("epoch") == self.epoch:
+                                self.events.append(data)
+                                self.last = max(self.last, data["version"])
+                            kind, data = None, None
+            except Exception: pass
+            self.connected = False
+            time.sleep(3)
+
+    def since(self, seen: tuple) -> list:
+        """Events after `seen` = (gen, version); everything since the reset if gen is stale."""
+        after = seen[1] if seen[0] == self.gen else 0
+        return [e for e in list(self.events) if e["version"] > after]
+
+
+@st.cache_resource(show_spinner=False)
+def session_feed() -> SessionFeed:
+    return SessionFeed(f"{API_BASE}/events")
+
+
+@st.fragment(run_every=1)
+def feed_panel():
+    feed = session_feed()
+    if "feed_seen" not in st.session_state:   # only what arrives after this tab opened
+        st.session_state.feed_seen = (feed.gen, feed.last)
+    auto = st.toggle("Auto-load new sessions", value=True, key="auto_load")
+    st.caption("● Listening for device uploads" if feed.connected else "○ Connecting to the session feed…")
+    new = feed.since(st.session_state.feed_seen)
+    if not new: return
+    st.session_state.feed_seen = (feed.gen, max(e["version"] for e in new))
+    if not auto: return
+    loaded = {s.get("id") for s in st.session_state.api_sessions}
+    for e in new:
+        if e["id"] in loaded: continue
+        try:
+            resp = requests.get(f"{API_BASE}/sessions/{e['id']}",
+                                headers={"Accept-Encoding": ACCEPT_ENC}, timeout=15)
+            if resp.status_code == 200:
+                load_api_session(resp.json(), resp.headers.get("ETag"))
+        except Exception: pass
+    st.rerun()                                # full rerun: render the new session sections
+
+
+def make_chart(df: pd.DataFrame, cols: list, title: str, pal: str, series: dict = None) -> plt.Figure:
     pals = {
         "blue" : ["#0F62FE", "#5B8DEF", "#A8C2FD"],
         "teal" : ["#007B7B", "#18A8A8", "#6DD5D5"],
@@ -678,7 +749,13 @@ def make_chart(df: pd.DataFrame, cols: list, title: str, pal: str) -> plt.Figure
     fig, ax = plt.subplots(figsize=(5, 3.1), facecolor="#FFFFFF")
     ax.set_facecolor("#F7F8FA")
     for i, c in enumerate(cols):
-        if c in df.columns:
+        if series and c in series["series"]:          # pre-aggregated: mean line in a min–max band
+            x  = [j * series["bucket"] for j in range(series["points"])]
+            sc = {k: pd.Series(v, dtype="float64") for k, v in series["series"][c].items()}
+            ax.fill_between(x, sc["min"], sc["max"], color=cl[i % len(cl)], alpha=0.16, linewidth=0)
+            ax.plot(x, sc["mean"], label=c.split("_")[-1],
+                    linewidth=1.9, alpha=0.87, color=cl[i % len(cl)])
+        elif c in df.columns:
             ax.plot(df[c].values,
                     label=c.split("_")[-1] if "_" in c else c,
                     linewidth=1.9, alpha=0.87, color=cl[i % len(cl)])
@@ -718,6 +795,15 @@ with st.sidebar:
         help="Prefix prepended to all downloaded CSV filenames",
     )
 
+    export_fmt = st.selectbox(
+        "Export format",
+        list(EXPORT_FMT),
+        key="xf",
+        help="Parquet / Feather store float32 parameters, datetime Time and int8 Label — "
+             "several times smaller than CSV and much faster to load",
+    )
+    xext = EXPORT_FMT[export_fmt][0]
+
     st.markdown("""
     <div style="margin:1.2rem 0; padding:.9rem 1rem;
                 background:#F7F8FA; border-top:1px solid #E5E8ED; border-bottom:1px solid #E5E8ED;">
@@ -751,7 +837,9 @@ with st.sidebar:
         if st.button("Clear all API sessions", use_container_width=True, key="clr"):
             st.session_state.api_sessions = []
             st.session_state.fetch_msg    = None
-            cached_parse_57.clear(); cached_to19.clear(); gc.collect()
+            cached_parse_57.clear(); cached_to19.clear()
+            for k in [k for k in st.session_state if k.startswith("exp_")]: drop_export(k[4:])
+            gc.collect()
             st.rerun()
         st.markdown("</div>", unsafe_allow_html=True)
 
@@ -824,6 +912,8 @@ with col_api:
     fetch_clicked = st.button("📡  Fetch latest session", use_container_width=True, key="fetch_btn")
     st.markdown("</div>", unsafe_allow_html=True)
 
+    feed_panel()
+
     if st.session_state.fetch_msg:
         css  = {"success": "ok", "error": "err", "warning": "warn"}.get(
                 st.session_state.fetch_type, "info")
@@ -837,30 +927,16 @@ with col_api:
     if fetch_clicked:
         with st.spinner("Connecting to device API…"):
             try:
-                resp = requests.get(f"{API_BASE}/latest", timeout=15)
-                if resp.status_code == 200:
-                    payload = resp.json()
-                    content = resp.json().get("content", "").strip()
-                    if content:
-                        meta  = extract_meta(content, device_name_input, payload)
-                        dn    = meta["device_name"] if meta["device_name"] != "—" else "Device"
-                        sname = f"{dn} · {meta['fetched_date']} {meta['fetched_at']}"
-                        if sname not in [s["name"] for s in st.session_state.api_sessions]:
-                            st.session_state.api_sessions.insert(
-                                0, {"name": sname, "txt": content, "meta": meta}
-                            )
-                            gc.collect()
-                            st.session_state.fetch_msg  = (
-                                f"Loaded <strong>{sname}</strong> — "
-                                f"{meta['records']:,} records · {meta['size_kb']} KB"
-                            )
-                            st.session_state.fetch_type = "success"
-                        else:
-                            st.session_state.fetch_msg  = f"Already loaded: {sname}"
-                            st.session_state.fetch_type = "warning"
-                    else:
-                        st.session_state.fetch_msg  = "No data yet — run the Device Simulator first."
-                        st.session_state.fetch_type = "warning"
+                # Conditional GET: send the ETags of every session already loaded,
+                # so an unchanged /latest costs an empty 304 instead of the full body.
+                seen = ", ".join(s["etag"] for s in st.session_state.api_sessions if s.get("etag"))
+                hdrs = {"Accept-Encoding": ACCEPT_ENC, **({"If-None-Match": seen} if seen else {})}
+                resp = requests.get(f"{API_BASE}/latest", headers=hdrs, timeout=15)
+                if resp.status_code == 304:
+                    st.session_state.fetch_msg  = "Already loaded — no new data on the device API."
+                    st.session_state.fetch_type = "warning"
+                elif resp.status_code == 200:
+                    load_api_session(resp.json(), resp.headers.get("ETag"), device_name_input)
                 else:
                     st.session_state.fetch_msg  = f"Server returned HTTP {resp.status_code}."
                     st.session_state.fetch_type = "error"
@@ -883,294 +959,277 @@ st.markdown("</div>", unsafe_allow_html=True)   # close .band
 # ═══════════════════════════════════════════════════════════════════════
 file_list = []
 for s in st.session_state.api_sessions:
-    file_list.append({"name": s["name"], "txt": s["txt"],
-                      "source": "api",    "meta": s.get("meta")})
+    file_list.append({"name": s["name"], "txt": s["txt"], "key": s["key"],
+                      "source": "api",    "meta": s.get("meta"), "id": s.get("id"), "etag": s.get("etag")})
 if uploaded_files:
+    seen = st.session_state.uploads
     for f in uploaded_files:
-        file_list.append({"name": f.name,
-                          "txt":  f.read().decode("utf-8", errors="replace"),
+        if f.file_id not in seen:
+            raw = f.getvalue()
+            seen[f.file_id] = (raw.decode("utf-8", errors="replace"), txt_key(raw))
+        txt, key = seen[f.file_id]
+        file_list.append({"name": f.name, "txt": txt, "key": key,
                           "source": "upload", "meta": None})
+st.session_state.uploads = {f.file_id: st.session_state.uploads[f.file_id] for f in uploaded_files or []}
 
 # ═══════════════════════════════════════════════════════════════════════
-#  EMPTY STATE
-# ═══════════════════════════════════════════════════════════════════════
-if not file_list:
-    st.markdown("""
-    <div style="padding:5rem 2.5rem; text-align:center; border-top:1px solid #E5E8ED; background:#FFFFFF;">
-      <div style="font-size:2rem; margin-bottom:.7rem; opacity:.15;">⚡</div>
-      <div style="font-family:'Sora',sans-serif; font-size:.95rem; font-weight:600;
-                  color:#2E3440; margin-bottom:.4rem;">No sessions loaded</div>
-      <div style="font-size:.84rem; color:#8D96A6; max-width:460px;
-                  margin:0 auto; line-height:1.75;">
-        Upload TXT files or fetch from the device API.
-        Each session appears as a full-width section below — configure its time window,
-        inspect charts and tables, then download 57-feature and 19-feature CSVs
-        individually or as a merged dataset.
-      </div>
-    </div>
-    """, unsafe_allow_html=True)
-
-# ═══════════════════════════════════════════════════════════════════════
-#  STEP 2  ─  CONFIGURE & EXPORT  (one section per session)
+#  SESSION FRAGMENTS
+#  Each session renders inside its own st.fragment, so a slider or label
+#  change reruns that session only.  Its export-ready frames are left in
+#  st.session_state.sess_out; the merged section polls those results and
+#  re-concats only when one of the session signatures changed.
 # ═══════════════════════════════════════════════════════════════════════
-else:
-    n = len(file_list)
+@st.fragment
+def render_session(file: dict):
+    fname  = file["name"]
+    is_api = file["source"] == "api"
+    meta   = file.get("meta")
+    st.session_state.sess_out.pop(fname, None)
+
+    # ── Session header ────────────────────────────────────────
     st.markdown(f"""
-    <div class="band" style="padding-bottom:.5rem; background:#F7F8FA;">
-      <div class="band-title-row" style="margin-bottom:0;">
-        <span class="band-step">Step 2</span>
-        <span class="band-title">Configure &amp; Export</span>
-        <span class="band-hint">{n} session{"s" if n != 1 else ""} loaded</span>
-      </div>
+    <div class="session-start"></div>
+    <div class="session-title-band">
+      <span class="session-icon">{"📡" if is_api else "📄"}</span>
+      <span class="session-name">{fname}</span>
+      <span class="chip {"chip-teal" if is_api else "chip-blue"}">
+        {"API" if is_api else "File"}
+      </span>
     </div>
+    <div class="session-body">
     """, unsafe_allow_html=True)
 
-    all_57, all_19, merge_rows = [], [], []
+    # ── Remove button (API only) ──────────────────────────────
+    if is_api:
+        _, rb = st.columns([8, 1])
+        with rb:
+            st.markdown('<div class="btn-red">', unsafe_allow_html=True)
+            if st.button("Remove", key=f"rm_{fname}"):
+                st.session_state.api_sessions = [
+                    s for s in st.session_state.api_sessions if s["name"] != fname
+                ]
+                gc.collect(); st.rerun()
+            st.markdown("</div>", unsafe_allow_html=True)
 
-    for file in file_list:
-        fname  = file["name"]
-        is_api = file["source"] == "api"
-        meta   = file.get("meta")
+    # ── Session information KV table ──────────────────────────
+    if meta:
+        st.markdown('<div class="sub-label">Session information</div>', unsafe_allow_html=True)
+
+        def _kv(k, v, cls="kv-v"):
+            if v in ("—", "", None):
+                return (f'<div class="kv-cell">'
+                        f'<div class="kv-k">{k}</div>'
+                        f'<div class="kv-v empty">not available</div></div>')
+            return (f'<div class="kv-cell">'
+                    f'<div class="kv-k">{k}</div>'
+                    f'<div class="{cls}">{v}</div></div>')
 
-        # ── Session header ────────────────────────────────────────
         st.markdown(f"""
-        <div class="session-start"></div>
-        <div class="session-title-band">
-          <span class="session-icon">{"📡" if is_api else "📄"}</span>
-          <span class="session-name">{fname}</span>
-          <span class="chip {"chip-teal" if is_api else "chip-blue"}">
-            {"API" if is_api else "File"}
-          </span>
+        <div class="kv-table">
+          {_kv("Device name",   meta["device_name"],   "kv-v accent")}
+          {_kv("Sampling rate", meta["sampling_rate"])}
+          {_kv("Duration",      meta["duration"])}
+          {_kv("Records",       f"{meta['records']:,}",  "kv-v accent")}
+          {_kv("Expected",      meta["expected_rec"])}
+          {_kv("Rec / hour",    meta["rec_per_hour"])}
+          {_kv("Completeness",  meta["completeness"])}
+          {_kv("Start",         meta["t_start"],        "kv-v small")}
+          {_kv("End",           meta["t_end"],          "kv-v small")}
+          {_kv("File size",     f"{meta['size_kb']} KB")}
+          {_kv("Fetched",       f"{meta['fetched_date']} {meta['fetched_at']}", "kv-v small")}
         </div>
-        <div class="session-body">
         """, unsafe_allow_html=True)
 
-        # ── Remove button (API only) ──────────────────────────────
-        if is_api:
-            _, rb = st.columns([8, 1])
-            with rb:
-                st.markdown('<div class="btn-red">', unsafe_allow_html=True)
-                if st.button("Remove", key=f"rm_{fname}"):
-                    st.session_state.api_sessions = [
-                        s for s in st.session_state.api_sessions if s["name"] != fname
-                    ]
-                    gc.collect(); st.rerun()
-                st.markdown("</div>", unsafe_allow_html=True)
-
-        # ── Session information KV table ──────────────────────────
-        if meta:
-            st.markdown('<div class="sub-label">Session information</div>', unsafe_allow_html=True)
-
-            def _kv(k, v, cls="kv-v"):
-                if v in ("—", "", None):
-                    return (f'<div class="kv-cell">'
-                            f'<div class="kv-k">{k}</div>'
-                            f'<div class="kv-v empty">not available</div></div>')
-                return (f'<div class="kv-cell">'
-                        f'<div class="kv-k">{k}</div>'
-                        f'<div class="{cls}">{v}</div></div>')
-
-            st.markdown(f"""
-            <div class="kv-table">
-              {_kv("Device name",   meta["device_name"],   "kv-v accent")}
-              {_kv("Sampling rate", meta["sampling_rate"])}
-              {_kv("Duration",      meta["duration"])}
-              {_kv("Records",       f"{meta['records']:,}",  "kv-v accent")}
-              {_kv("Expected",      meta["expected_rec"])}
-              {_kv("Rec / hour",    meta["rec_per_hour"])}
-              {_kv("Completeness",  meta["completeness"])}
-              {_kv("Start",         meta["t_start"],        "kv-v small")}
-              {_kv("End",           meta["t_end"],          "kv-v small")}
-              {_kv("File size",     f"{meta['size_kb']} KB")}
-              {_kv("Fetched",       f"{meta['fetched_date']} {meta['fetched_at']}", "kv-v small")}
-            </div>
-            """, unsafe_allow_html=True)
-
-        # ── Raw TXT preview ───────────────────────────────────────
-        st.markdown('<div class="sub-label">Raw data preview</div>', unsafe_allow_html=True)
-        prev = file["txt"][:900] + ("\n… [truncated]" if len(file["txt"]) > 900 else "")
-        st.markdown(f'<div class="code-preview">{hl_txt(prev)}</div>', unsafe_allow_html=True)
-
-        # ── Fault label ───────────────────────────────────────────
-        st.markdown('<div class="sub-label">Fault label</div>', unsafe_allow_html=True)
-        la, lb = st.columns([1, 2])
-        with la:
-            use_label = st.checkbox("Attach label column", key=f"chk_{fname}")
-        with lb:
-            label_value = None
-            if use_label:
-                label_value = LABEL_MAP[st.selectbox(
-                    "Fault type", list(LABEL_MAP.keys()),
-                    key=f"lbl_{fname}", label_visibility="collapsed",
-                )]
-
-        # ── Parse (cached) ────────────────────────────────────────
-        with st.spinner("Parsing records…"):
-            df_base = cached_parse_57(file["txt"])
-
-        if df_base.empty:
-            st.markdown(
-                '<div class="ia err"><span>❌</span><span>No vibration records found. Check the file format.</span></div>',
-                unsafe_allow_html=True,
-            )
-            st.markdown("</div>", unsafe_allow_html=True)
-            continue
+    # ── Raw TXT preview ───────────────────────────────────────
+    st.markdown('<div class="sub-label">Raw data preview</div>', unsafe_allow_html=True)
+    prev = file["txt"][:900] + ("\n… [truncated]" if len(file["txt"]) > 900 else "")
+    st.markdown(f'<div class="code-preview">{hl_txt(prev)}</div>', unsafe_allow_html=True)
+
+    # ── Fault label ───────────────────────────────────────────
+    st.markdown('<div class="sub-label">Fault label</div>', unsafe_allow_html=True)
+    la, lb = st.columns([1, 2])
+    with la:
+        use_label = st.checkbox("Attach label column", key=f"chk_{fname}")
+    with lb:
+        label_value = None
+        if use_label:
+            label_value = LABEL_MAP[st.selectbox(
+                "Fault type", list(LABEL_MAP.keys()),
+                key=f"lbl_{fname}", label_visibility="collapsed",
+            )]
 
-        # ── Time window ───────────────────────────────────────────
-        st.markdown('<div class="sub-label">Time window selection</div>', unsafe_allow_html=True)
+    # ── Parse (cached) ────────────────────────────────────────
+    with st.spinner("Parsing records…"):
+        df_base = cached_parse_57(file["key"], file["txt"], file.get("id"), file.get("etag"))
 
-        # Copy before adding derived column — fixes SettingWithCopyWarning / pandas crash
-        df_57 = df_base.copy()
-        df_57["Time_dt"] = pd.to_datetime(df_57["Time"], format="%d/%m/%Y %H:%M:%S")
+    if df_base.empty:
+        st.markdown(
+            '<div class="ia err"><span>❌</span><span>No vibration records found. Check the file format.</span></div>',
+            unsafe_allow_html=True,
+        )
+        st.markdown("</div>", unsafe_allow_html=True)
+        return
 
-        time_list = df_57["Time_dt"].tolist()
-        tmin, tmax = df_57["Time_dt"].min().to_pydatetime(), df_57["Time_dt"].max().to_pydatetime()
-        N = len(time_list)
+    # ── Time window ───────────────────────────────────────────
+    st.markdown('<div class="sub-label">Time window selection</div>', unsafe_allow_html=True)
 
-        method = st.radio(
-            "Method", ["⚡  Quick slider", "🎯  Precise input"],
-            horizontal=True, key=f"tw_{fname}", label_visibility="collapsed",
-        )
+    # Copy before adding derived column — fixes SettingWithCopyWarning / pandas crash
+    df_57 = df_base.copy()
+    df_57["Time_dt"] = pd.to_datetime(df_57["Time"], format="%d/%m/%Y %H:%M:%S")
 
-        if method == "⚡  Quick slider":
-            cs, cm = st.columns([5, 1])
-            with cs:
-                si, ei = st.slider("Range", 0, N-1, (0, N-1),
-                                   key=f"sl_{fname}", label_visibility="collapsed")
-                start, end = time_list[si], time_list[ei]
-                st.caption(
-                    f"From  {start.strftime('%d/%m/%Y %H:%M:%S')}   →   {end.strftime('%d/%m/%Y %H:%M:%S')}"
-                )
-            with cm:
-                st.metric("Total", N)
-                st.metric("Selected", ei - si + 1)
-        else:
-            c1, c2, c3 = st.columns([2, 2, 1])
-            with c1:
-                sd = st.date_input("Start date", tmin.date(), tmin.date(), tmax.date(), key=f"sd_{fname}")
-                sv = st.time_input("Start time", tmin.time(), key=f"sv_{fname}")
-                start = datetime.combine(sd, sv)
-            with c2:
-                ed = st.date_input("End date",   tmax.date(), tmin.date(), tmax.date(), key=f"ed_{fname}")
-                ev = st.time_input("End time",   tmax.time(), key=f"ev_{fname}")
-                end = datetime.combine(ed, ev)
-            with c3:
-                sn = len(df_57[(df_57["Time_dt"] >= start) & (df_57["Time_dt"] <= end)])
-                st.metric("Total", N); st.metric("Selected", sn)
-            if start > end:
-                st.markdown(
-                    '<div class="ia err"><span>⚠️</span><span>Start must be before End.</span></div>',
-                    unsafe_allow_html=True,
-                )
-                start, end = tmin, tmax
-
-        df_57 = df_57[(df_57["Time_dt"] >= start) & (df_57["Time_dt"] <= end)].copy()
-        df_57 = df_57.drop(columns="Time_dt").reset_index(drop=True)
+    time_list = df_57["Time_dt"].tolist()
+    tmin, tmax = df_57["Time_dt"].min().to_pydatetime(), df_57["Time_dt"].max().to_pydatetime()
+    N = len(time_list)
 
-        if use_label:
-            df_57 = df_57.copy()
-            df_57["Label"] = label_value
+    method = st.radio(
+        "Method", ["⚡  Quick slider", "🎯  Precise input"],
+        horizontal=True, key=f"tw_{fname}", label_visibility="collapsed",
+    )
 
-        if df_57.empty:
+    if method == "⚡  Quick slider":
+        cs, cm = st.columns([5, 1])
+        with cs:
+            si, ei = st.slider("Range", 0, N-1, (0, N-1),
+                               key=f"sl_{fname}", label_visibility="collapsed")
+            start, end = time_list[si], time_list[ei]
+            st.caption(
+                f"From  {start.strftime('%d/%m/%Y %H:%M:%S')}   →   {end.strftime('%d/%m/%Y %H:%M:%S')}"
+            )
+        with cm:
+            st.metric("Total", N)
+            st.metric("Selected", ei - si + 1)
+    else:
+        c1, c2, c3 = st.columns([2, 2, 1])
+        with c1:
+            sd = st.date_input("Start date", tmin.date(), tmin.date(), tmax.date(), key=f"sd_{fname}")
+            sv = st.time_input("Start time", tmin.time(), key=f"sv_{fname}")
+            start = datetime.combine(sd, sv)
+        with c2:
+            ed = st.date_input("End date",   tmax.date(), tmin.date(), tmax.date(), key=f"ed_{fname}")
+            ev = st.time_input("End time",   tmax.time(), key=f"ev_{fname}")
+            end = datetime.combine(ed, ev)
+        with c3:
+            sn = len(df_57[(df_57["Time_dt"] >= start) & (df_57["Time_dt"] <= end)])
+            st.metric("Total", N); st.metric("Selected", sn)
+        if start > end:
             st.markdown(
-                '<div class="ia warn"><span>⚠️</span><span>No records in selected window — adjust the range.</span></div>',
+                '<div class="ia err"><span>⚠️</span><span>Start must be before End.</span></div>',
                 unsafe_allow_html=True,
             )
-            st.markdown("</div>", unsafe_allow_html=True)
-            continue
-
-        ck    = f"{fname}|{len(df_57)}|{use_label}|{label_value}"
-        df_19 = cached_to19(ck, df_57)
-
-        # ── Feature charts ────────────────────────────────────────
-        st.markdown('<div class="sub-label">Feature visualization</div>', unsafe_allow_html=True)
-        ch1, ch2, ch3 = st.columns(3)
-        with ch1:
-            st.pyplot(make_chart(df_57, ["Parameter-1_X","Parameter-1_Y","Parameter-1_Z"],
-                                 "Parameter-1 · RMS", "blue"), use_container_width=True)
-        with ch2:
-            st.pyplot(make_chart(df_57, ["Parameter-2_X","Parameter-2_Y","Parameter-2_Z"],
-                                 "Parameter-2 · Peak-to-Peak", "teal"), use_container_width=True)
-        with ch3:
-            st.pyplot(make_chart(df_57, ["Parameter-3_X","Parameter-3_Y","Parameter-3_Z"],
-                                 "Parameter-3 · Kurtosis", "amber"), use_container_width=True)
-        plt.close("all")
-
-        # ── Data tables ───────────────────────────────────────────
-        st.markdown('<div class="sub-label">57-feature table</div>', unsafe_allow_html=True)
-        st.dataframe(df_57, height=240, use_container_width=True)
-
-        st.markdown('<div class="sub-label">19-feature table</div>', unsafe_allow_html=True)
+            start, end = tmin, tmax
+
+    df_57 = df_57[(df_57["Time_dt"] >= start) & (df_57["Time_dt"] <= end)].copy()
+    df_57 = df_57.drop(columns="Time_dt").reset_index(drop=True)
+
+    if use_label:
+        df_57 = label_frame(df_57, label_value)
+
+    if df_57.empty:
         st.markdown(
-            '<div class="ia info"><span>ℹ️</span>'
-            '<span>Each record expands to 3 rows — one per axis (X, Y, Z). '
-            'Axes share the same timestamp.</span></div>',
+            '<div class="ia warn"><span>⚠️</span><span>No records in selected window — adjust the range.</span></div>',
             unsafe_allow_html=True,
         )
-        st.dataframe(df_19, height=240, use_container_width=True)
+        st.markdown("</div>", unsafe_allow_html=True)
+        return
+
+    ck    = f"{fname}|{len(df_57)}|{use_label}|{label_value}"
+    df_19 = cached_to19(ck, df_57)
+
+    # ── Feature charts ────────────────────────────────────────
+    # Whole API session → the server's downsampled series (if it matches
+    # the loaded snapshot); a narrowed window is plotted from the frame.
+    st.markdown('<div class="sub-label">Feature visualization</div>', unsafe_allow_html=True)
+    series = api_series(file["id"], file.get("etag")) if file.get("id") and len(df_57) == N else None
+    if series and series.get("records") != N: series = None
+    ch1, ch2, ch3 = st.columns(3)
+    with ch1:
+        st.pyplot(make_chart(df_57, ["Parameter-1_X","Parameter-1_Y","Parameter-1_Z"],
+                             "Parameter-1 · RMS", "blue", series), use_container_width=True)
+    with ch2:
+        st.pyplot(make_chart(df_57, ["Parameter-2_X","Parameter-2_Y","Parameter-2_Z"],
+                             "Parameter-2 · Peak-to-Peak", "teal", series), use_container_width=True)
+    with ch3:
+        st.pyplot(make_chart(df_57, ["Parameter-3_X","Parameter-3_Y","Parameter-3_Z"],
+                             "Parameter-3 · Kurtosis", "amber", series), use_container_width=True)
+    plt.close("all")
+
+    # ── Data tables ───────────────────────────────────────────
+    st.markdown('<div class="sub-label">57-feature table</div>', unsafe_allow_html=True)
+    st.dataframe(df_57, height=240, use_container_width=True)
+
+    st.markdown('<div class="sub-label">19-feature table</div>', unsafe_allow_html=True)
+    st.markdown(
+        '<div class="ia info"><span>ℹ️</span>'
+        '<span>Each record expands to 3 rows — one per axis (X, Y, Z). '
+        'Axes share the same timestamp.</span></div>',
+        unsafe_allow_html=True,
+    )
+    st.dataframe(df_19, height=240, use_container_width=True)
 
-        # ── Downloads ─────────────────────────────────────────────
-        st.markdown('<div class="sub-label">Download this session</div>', unsafe_allow_html=True)
+    # ── Downloads ─────────────────────────────────────────────
+    st.markdown('<div class="sub-label">Download this session</div>', unsafe_allow_html=True)
 
-        pfx   = file_prefix.strip() if file_prefix.strip() else re.sub(r'[^\w\-.]','_', fname.replace(".txt",""))[:35]
-        clean = re.sub(r'[^\w\-.]', '_', fname)[:22]
-        f57n  = f"{pfx}_{clean}_57feat.csv" if file_prefix.strip() else f"{clean}_57feat.csv"
-        f19n  = f"{pfx}_{clean}_19feat.csv" if file_prefix.strip() else f"{clean}_19feat.csv"
+    pfx   = file_prefix.strip() if file_prefix.strip() else re.sub(r'[^\w\-.]','_', fname.replace(".txt",""))[:35]
+    clean = re.sub(r'[^\w\-.]', '_', fname)[:22]
+    f57n  = f"{pfx}_{clean}_57feat{xext}" if file_prefix.strip() else f"{clean}_57feat{xext}"
+    f19n  = f"{pfx}_{clean}_19feat{xext}" if file_prefix.strip() else f"{clean}_19feat{xext}"
 
+    st.markdown(
+        f'<div class="ia ok"><span>✅</span>'
+        f'<span>Ready — <strong>{len(df_57):,} records</strong> selected · '
+        f'{len(df_57.columns)} cols (57-feat) · {len(df_19):,} rows (19-feat)</span></div>',
+        unsafe_allow_html=True,
+    )
+
+    sig = (file["key"], len(df_57), df_57["Time"].iat[0], df_57["Time"].iat[-1], label_value)
+    d1, d2 = st.columns(2)
+    with d1:
+        lazy_download(f"📥  Download 57-feature {export_fmt}", (*sig, "57"), df_57, f57n, f"dl57_{fname}", export_fmt)
         st.markdown(
-            f'<div class="ia ok"><span>✅</span>'
-            f'<span>Ready — <strong>{len(df_57):,} records</strong> selected · '
-            f'{len(df_57.columns)} cols (57-feat) · {len(df_19):,} rows (19-feat)</span></div>',
+            f'<div class="dl-meta">{f57n}  ·  {len(df_57):,} rows  ·  {len(df_57.columns)} cols</div>',
+            unsafe_allow_html=True,
+        )
+    with d2:
+        st.markdown('<div class="dl-teal">', unsafe_allow_html=True)
+        lazy_download(f"📥  Download 19-feature {export_fmt}", (*sig, "19"), df_19, f19n, f"dl19_{fname}", export_fmt)
+        st.markdown("</div>", unsafe_allow_html=True)
+        st.markdown(
+            f'<div class="dl-meta">{f19n}  ·  {len(df_19):,} rows  ·  20 cols</div>',
             unsafe_allow_html=True,
         )
 
-        d1, d2 = st.columns(2)
-        with d1:
-            st.download_button(
-                "📥  Download 57-feature CSV",
-                df_57.to_csv(index=False), f57n, "text/csv",
-                key=f"dl57_{fname}", use_container_width=True,
-            )
-            st.markdown(
-                f'<div class="dl-meta">{f57n}  ·  {len(df_57):,} rows  ·  {len(df_57.columns)} cols</div>',
-                unsafe_allow_html=True,
-            )
-        with d2:
-            st.markdown('<div class="dl-teal">', unsafe_allow_html=True)
-            st.download_button(
-                "📥  Download 19-feature CSV",
-                df_19.to_csv(index=False), f19n, "text/csv",
-                key=f"dl19_{fname}", use_container_width=True,
-            )
-            st.markdown("</div>", unsafe_allow_html=True)
-            st.markdown(
-                f'<div class="dl-meta">{f19n}  ·  {len(df_19):,} rows  ·  20 cols</div>',
-                unsafe_allow_html=True,
-            )
+    st.markdown("</div>", unsafe_allow_html=True)   # close .session-body
 
-        st.markdown("</div>", unsafe_allow_html=True)   # close .session-body
+    lbl_str = (
+        next((k for k, v in LABEL_MAP.items() if v == label_value), "—")
+        if use_label else "None"
+    )
+    st.session_state.sess_out[fname] = {
+        "sig":  sig,
+        "name": fname,
+        "src":  "API" if is_api else "File",
+        "n":    len(df_57),
+        "lbl":  lbl_str,
+        "df57": df_57,
+        "df19": df_19,
+    }
 
-        all_57.append(df_57); all_19.append(df_19)
-        lbl_str = (
-            next((k for k, v in LABEL_MAP.items() if v == label_value), "—")
-            if use_label else "None"
-        )
-        merge_rows.append({
-            "name": fname,
-            "src":  "API" if is_api else "File",
-            "n":    len(df_57),
-            "lbl":  lbl_str,
-        })
 
-    # ═══════════════════════════════════════════════════════════════
-    #  STEP 3  ─  MERGED DOWNLOAD
-    # ═══════════════════════════════════════════════════════════════
-    if all_57:
-        merged_57 = pd.concat(all_57, ignore_index=True)
-        merged_19 = pd.concat(all_19, ignore_index=True)
+@st.fragment(run_every=2)
+def render_merged(names: list):
+    out = [st.session_state.sess_out[n] for n in names if n in st.session_state.sess_out]
+    if out:
+        sig = tuple(o["sig"] for o in out)
+        mm  = st.session_state.merged
+        if mm.get("sig") != sig:                  # only re-concat when a session changed
+            mm.clear(); gc.collect()
+            mm["sig"] = sig
+            mm["m57"] = pd.concat([o["df57"] for o in out], ignore_index=True)
+            mm["m19"] = pd.concat([o["df19"] for o in out], ignore_index=True)
+        merged_57, merged_19 = mm["m57"], mm["m19"]
         pfx_m = (file_prefix.strip() + "_") if file_prefix.strip() else ""
-        mf57  = f"{pfx_m}Merged_57feat.csv"
-        mf19  = f"{pfx_m}Merged_19feat.csv"
+        mf57  = f"{pfx_m}Merged_57feat{xext}"
+        mf19  = f"{pfx_m}Merged_19feat{xext}"
 
         rows_html = "".join(
             f'<tr>'
@@ -1178,7 +1237,7 @@ else:
             f'<td>{m["n"]:,}</td>'
             f'<td>{m["lbl"]}</td>'
             f'</tr>'
-            for m in merge_rows
+            for m in out
         )
 
         st.markdown(f"""
@@ -1198,7 +1257,7 @@ else:
         """, unsafe_allow_html=True)
 
         mc1, mc2, mc3, mc4 = st.columns(4)
-        with mc1: st.metric("Sessions merged", len(all_57))
+        with mc1: st.metric("Sessions merged", len(out))
         with mc2: st.metric("57-feat rows",    f"{len(merged_57):,}")
         with mc3: st.metric("19-feat rows",    f"{len(merged_19):,}")
         with mc4: st.metric("Columns (57)",    len(merged_57.columns))
@@ -1220,11 +1279,7 @@ else:
             _, bc, _ = st.columns([0.06, 10, 0.06])
             with bc:
                 st.markdown('<div class="dl-mrg-b">', unsafe_allow_html=True)
-                st.download_button(
-                    f"📥  Download {mf57}",
-                    merged_57.to_csv(index=False), mf57, "text/csv",
-                    key="dl_m57", use_container_width=True,
-                )
+                lazy_download(f"📥  Download {mf57}", (sig, "57"), merged_57, mf57, "dl_m57", export_fmt)
                 st.markdown("</div>", unsafe_allow_html=True)
 
         with d2:
@@ -1236,15 +1291,58 @@ else:
             _, bc2, _ = st.columns([0.06, 10, 0.06])
             with bc2:
                 st.markdown('<div class="dl-mrg-t">', unsafe_allow_html=True)
-                st.download_button(
-                    f"📥  Download {mf19}",
-                    merged_19.to_csv(index=False), mf19, "text/csv",
-                    key="dl_m19", use_container_width=True,
-                )
+                lazy_download(f"📥  Download {mf19}", (sig, "19"), merged_19, mf19, "dl_m19", export_fmt)
                 st.markdown("</div>", unsafe_allow_html=True)
 
         st.markdown('<div style="height:2rem;"></div>', unsafe_allow_html=True)
 
+
+# ═══════════════════════════════════════════════════════════════════════
+#  EMPTY STATE
+# ═══════════════════════════════════════════════════════════════════════
+if not file_list:
+    st.markdown("""
+    <div style="padding:5rem 2.5rem; text-align:center; border-top:1px solid #E5E8ED; background:#FFFFFF;">
+      <div style="font-size:2rem; margin-bottom:.7rem; opacity:.15;">⚡</div>
+      <div style="font-family:'Sora',sans-serif; font-size:.95rem; font-weight:600;
+                  color:#2E3440; margin-bottom:.4rem;">No sessions loaded</div>
+      <div style="font-size:.84rem; color:#8D96A6; max-width:460px;
+                  margin:0 auto; line-height:1.75;">
+        Upload TXT files or fetch from the device API.
+        Each session appears as a full-width section below — configure its time window,
+        inspect charts and tables, then download 57-feature and 19-feature CSVs
+        individually or as a merged dataset.
+      </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+# ═══════════════════════════════════════════════════════════════════════
+#  STEP 2  ─  CONFIGURE & EXPORT  (one section per session)
+# ═══════════════════════════════════════════════════════════════════════
+else:
+    n = len(file_list)
+    st.markdown(f"""
+    <div class="band" style="padding-bottom:.5rem; background:#F7F8FA;">
+      <div class="band-title-row" style="margin-bottom:0;">
+        <span class="band-step">Step 2</span>
+        <span class="band-title">Configure &amp; Export</span>
+        <span class="band-hint">{n} session{"s" if n != 1 else ""} loaded</span>
+      </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    live = {f["name"] for f in file_list}
+    st.session_state.sess_out = {k: v for k, v in st.session_state.sess_out.items() if k in live}
+
+    for file in file_list:
+        render_session(file)
+
+    # ═══════════════════════════════════════════════════════════════
+    #  STEP 3  ─  MERGED DOWNLOAD
+    # ═══════════════════════════════════════════════════════════════
+    render_merged([f["name"] for f in file_list])
+
+
 # ═══════════════════════════════════════════════════════════════════════
 #  FOOTER
 # ═══════════════════════════════════════════════════════════════════════
@@ -0,0 +1,597 @@
+"""
+Vibration Data Converter  ·  core  ·  pump_project
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+Parse / convert / label logic shared by the Streamlit app (app.py) and
+the headless batch converter below.  No Streamlit imports here.
+
+Batch usage:
+    python converter.py <txt_dir> -o <out_dir> [--format parquet] [--label 2]
+                        [--merged] [-j N] [--force]
+
+Every *.txt under <txt_dir> becomes <name>_57feat.<ext> and
+<name>_19feat.<ext> in the mirrored folder under <out_dir>; files already
+converted from the same TXT with the same label and format are skipped.
+--merged also writes Merged_57feat.<ext> / Merged_19feat.<ext>, streamed
+file by file.
+"""
+
+import argparse, gzip, hashlib, json, os, re, sys, time
+from datetime import datetime
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+try:
+    import zstandard                          # optional — enables the zstd-compressed CSV export
+except ImportError:
+    zstandard = None
+
+# ═══════════════════════════════════════════════════════════════════════
+#  CONSTANTS
+# ═══════════════════════════════════════════════════════════════════════
+SR_LABEL  = {5: "5 sec", 10: "10 sec", 15: "15 sec", 30: "30 sec"}
+LABEL_MAP = {
+    "Normal_Mode (0)":        0,
+    "Seal Failure (1)":       1,
+    "Bearing (2)":            2,
+    "Shaft Misalignment (3)": 3,
+    "Unbalance_impeller (4)": 4,
+    "Cavitation (5)":         5,
+}
+EXPORT_FMT = {                                # label → (extension, MIME type, CSV compression)
+    "CSV":            (".csv",      "text/csv",                          None),
+    "CSV · gzip":     (".csv.gz",   "application/gzip",                  "gzip"),
+    "CSV · zstd":     (".csv.zst",  "application/zstd",                  "zstd"),
+    "Parquet · zstd": (".parquet",  "application/vnd.apache.parquet",    None),
+    "Feather":        (".feather",  "application/vnd.apache.arrow.file", None),
+}
+if zstandard is None: del EXPORT_FMT["CSV · zstd"]
+
+# ═══════════════════════════════════════════════════════════════════════
+#  PARSER ENGINE
+#  The TXT is cut into record-aligned blocks of ~1 MB; each block is
+#  viewed as one uint8 array, blank↔text edges give every token's
+#  (start, end) offset, lines are classified by their first token and all
+#  values are cast in one bulk step into a preallocated float matrix.
+#  No per-line Python objects, and peak memory is bounded by the block.
+#  Column 3·(k-1)+a  ⇔  Parameter-k_{X,Y,Z}[a]
+#  Dialects:  Parameter-1/2/3 v  ·  Peak i Parameter-a f Parameter-b m
+#             RMS v · PP v · Kurtosis v  ·  Peak i Freq f Mag m  (legacy)
+# ═══════════════════════════════════════════════════════════════════════
+AXES    = ("X", "Y", "Z")
+COLS_57 = ["Time"] + [f"Parameter-{k}_{ax}" for k in range(1, 20) for ax in AXES]
+
+_TS_LINE = re.compile(rb"^[ \t]*\d+/\d+/\d+[ \t]+\d+:\d+:\d+[ \t]+(?:AM|PM)", re.M)
+_LEGACY  = ((b"RMS", 1), (b"PP", 2), (b"Kurtosis", 3))
+_DIM     = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+_BLOCK   = 1 << 20
+_PAD     = 32                                 # blank tail → cursors never run off the buffer
+_NAN8    = np.frombuffer(b"nan".ljust(8, b"\0"), dtype=np.uint64)[0]
+_MASK8   = np.where(np.arange(8) < np.arange(9)[:, None], 255, 0).astype(np.uint8).view(np.uint64).ravel()
+
+
+def _is(b, s, lit: bytes) -> np.ndarray:
+    ok = b[s] == lit[0]
+    for j in range(1, len(lit)):
+        ok &= b[s + j] == lit[j]
+    return ok
+
+
+def _small_int(b, s, e) -> np.ndarray:
+    """1–2 digit tokens → int; anything else → -1."""
+    n  = e - s
+    d0 = b[s].astype(np.int16) - 48
+    d1 = b[s + 1].astype(np.int16) - 48
+    ok = (d0 >= 0) & (d0 <= 9) & ((n == 1) | ((n == 2) & (d1 >= 0) & (d1 <= 9)))
+    return np.where(ok, np.where(n == 2, d0 * 10 + d1, d0), -1)
+
+
+def _fields(b, s, e, sep: int, k: int):
+    """Split tokens b[s:e] on sep into k unsigned ints → (values, digit counts, ok)."""
+    n   = len(s)
+    r   = np.arange(n)
+    val = np.zeros((n, k), dtype=np.int64)
+    cnt = np.zeros((n, k), dtype=np.int64)
+    f   = np.zeros(n, dtype=np.int64)
+    ok  = e - s <= _PAD
+    for j in range(_PAD):
+        live = s + j < e
+        if not live.any(): break
+        c   = b[s + j].astype(np.int64)
+        dig = live & (c >= 48) & (c <= 57)
+        cut = live & (c == sep)
+        ok &= ~live | dig | cut
+        i, fi = r[dig], np.minimum(f[dig], k - 1)
+        val[i, fi] = val[i, fi] * 10 + c[dig] - 48
+        cnt[i, fi] += 1
+        f += cut
+    return val, cnt, ok & (f == k - 1) & (cnt > 0).all(axis=1)
+
+
+def _fmt_ts(mo, d, y, h, mi, s) -> np.ndarray:
+    """Integer columns → "DD/MM/YYYY HH:MM:SS" strings, rendered as one byte matrix."""
+    out = np.full((len(y), 19), ord("/"), dtype=np.uint8)
+    for col, v, w in ((0, d, 2), (3, mo, 2), (6, y, 4), (11, h, 2), (14, mi, 2), (17, s, 2)):
+        for j in range(w):
+            out[:, col + j] = 48 + v // 10 ** (w - 1 - j) % 10
+    out[:, 10] = ord(" "); out[:, 13] = out[:, 16] = ord(":")
+    return out.view("S19").ravel().astype(str).astype(object)
+
+
+def _num(tok):
+    try:    return float(tok)
+    except: return np.nan
+
+
+def _floats(b, s, e) -> np.ndarray:
+    """Bulk float cast of tokens b[s:e]; empty / malformed tokens → NaN.
+    Tokens of ≤ 8 bytes are read as one unaligned uint64 each and factorised,
+    so every distinct spelling is converted only once."""
+    n = e - s
+    if n.max(initial=0) <= 8:
+        u64 = np.ndarray((len(b) - 7,), dtype=np.uint64, buffer=b, strides=(1,))
+        codes, tok = pd.factorize(np.where(n > 0, u64[s] & _MASK8[np.clip(n, 0, 8)], _NAN8))
+        tok = tok.view("S8")
+    else:
+        tok = np.lib.stride_tricks.sliding_window_view(b, _PAD)[s]
+        tok[np.arange(_PAD) >= n[:, None]] = 0
+        tok[n <= 0, :3] = np.frombuffer(b"nan", dtype=np.uint8)
+        codes, tok = None, tok.view(f"S{_PAD}").ravel()
+    try:    v = tok.astype(np.float64)
+    except ValueError:
+        v = np.array([_num(t) for t in tok.tolist()], dtype=np.float64)
+    v = v if codes is None else v[codes]
+    v[n > _PAD] = np.nan
+    return v
+
+
+def _parse_block(raw: bytes):
+    """One record-aligned slice → (Time strings, datetime64[s] stamps, records × 57 float matrix)."""
+    nb  = len(raw)
+    b   = np.frombuffer(raw + b" " * _PAD, dtype=np.uint8)
+
+    # ── Token table: blank ↔ text edges ───────────────────────
+    ws  = np.ones(len(b) + 1, dtype=bool)
+    np.less_equal(b, 32, out=ws[1:])
+    edg = np.flatnonzero(ws[1:] != ws[:-1]).reshape(-1, 2)
+    del ws
+    t0  = np.append(edg[:, 0], np.full(6, nb))                  # token start  (+ sentinels)
+    t1  = np.append(edg[:, 1], np.full(6, nb))                  # token end
+    nl  = np.flatnonzero(b[:nb] == 10)
+    le  = np.append(nl, nb)                                     # line ends
+    ft  = np.searchsorted(edg[:, 0], np.insert(nl + 1, 0, 0))   # first token of each line
+    del edg
+    ln  = np.flatnonzero(t0[ft] < le)                           # drop blank lines
+    ft, le = ft[ln], le[ln]
+    s0  = t0[ft]
+    c0, c1 = b[s0], b[s0 + 1]
+
+    # ── Record boundaries: "M/D/YYYY h:mm:ss AM|PM" lines ─────
+    i   = np.flatnonzero((c0 >= 48) & (c0 <= 57))
+    f   = ft[i]
+    dv, dn, d_ok = _fields(b, t0[f], t1[f], ord("/"), 3)
+    tv, tn, t_ok = _fields(b, t0[f + 1], t1[f + 1], ord(":"), 3)
+    pm  = _is(b, t0[f + 2], b"PM")
+    ts  = d_ok & t_ok & (t0[f + 2] < le[i]) & (pm | _is(b, t0[f + 2], b"AM"))
+    ts_i, f, pm = i[ts], f[ts], pm[ts]
+    (mo, d, y), (h, mi, s), dn, tn = dv[ts].T, tv[ts].T, dn[ts], tn[ts]
+    leap  = (y % 4 == 0) & ((y % 100 != 0) | (y % 400 == 0))
+    dim   = _DIM[np.clip(mo, 0, 12)] + (leap & (mo == 2))
+    clean = ((dn[:, :2] <= 2).all(axis=1) & (dn[:, 2] == 4) & (tn <= 2).all(axis=1)
+             & (mo >= 1) & (mo <= 12) & (d >= 1) & (d <= dim) & (y >= 1)
+             & (h >= 1) & (h <= 12) & (mi < 60) & (s < 60)
+             & (t1[f + 2] - t0[f + 2] == 2) & (t0[f + 3] >= le[ts_i]))
+    times = _fmt_ts(mo, d, y, h % 12 + 12 * pm, mi, s)
+    for j in np.flatnonzero(~clean):                            # strptime would reject → raw text
+        times[j] = raw[s0[ts_i[j]]:le[ts_i[j]]].decode("utf-8", errors="replace").strip()
+    if not len(ts_i):
+        return times, np.empty(0, dtype="M8[s]"), np.empty((0, len(COLS_57) - 1))
+    y, mo, d = (np.where(clean, v, 1) for v in (y - 1970, mo - 1, d - 1))
+    stamps = ((y.astype("M8[Y]").astype("M8[M]") + mo.astype("m8[M]")).astype("M8[D]")
+              + d.astype("m8[D]")).astype("M8[s]") + np.where(clean, (h % 12 + 12 * pm) * 3600 + mi * 60 + s, 0)
+    stamps[~clean] = np.datetime64("NaT")
+
+    # ── Axis context: latest "X/Y/Z Axis" header inside the record ─
+    ax_i = np.flatnonzero((c0 >= 88) & (c0 <= 90))
+    ax_i = ax_i[_is(b, s0[ax_i] + 1, b" Axis")]
+    ev_i = np.concatenate((ts_i, ax_i))
+    ev_a = np.concatenate((np.full(len(ts_i), -1), c0[ax_i].astype(np.int64) - 88))
+    o    = np.argsort(ev_i, kind="stable")
+    ev_i, ev_a = ev_i[o], ev_a[o]
+
+    def place(i):
+        """(record, axis) of lines i; -1 outside a record / axis block."""
+        e = np.searchsorted(ev_i, i, side="right") - 1
+        return np.searchsorted(ts_i, i, side="right") - 1, np.where(e >= 0, ev_a[np.maximum(e, 0)], -1)
+
+    # ── Parameter-1/2/3  ·  RMS / PP / Kurtosis ───────────────
+    i = np.flatnonzero((c0 == 80) & (c1 == 97))
+    i = i[_is(b, s0[i], b"Parameter-")]
+    k = _small_int(b, s0[i] + 10, t1[ft[i]])
+    i_1, k_1 = [i[(k >= 1) & (k <= 3)]], [k[(k >= 1) & (k <= 3)]]
+    for lit, k in _LEGACY:
+        i = np.flatnonzero((c0 == lit[0]) & (c1 == lit[1]))
+        i = i[_is(b, s0[i], lit)]
+        i_1.append(i); k_1.append(np.full(len(i), k))
+    i_1, k_1 = np.concatenate(i_1), np.concatenate(k_1)
+    o   = np.argsort(i_1, kind="stable")                        # later lines win
+    i_1, k_1 = i_1[o], k_1[o]
+    f   = ft[i_1] + 1
+    v_s = np.where(t0[f] < le[i_1], t0[f], 0)                   # missing value → empty token
+    v_e = np.where(t0[f] < le[i_1], t1[f], 0)
+
+    # ── Peak i  Parameter-a|Freq f  Parameter-b|Mag m ─────────
+    i   = np.flatnonzero((c0 == 80) & (c1 == 101))
+    i   = i[_is(b, s0[i], b"Peak") & (t1[ft[i]] - s0[i] == 4)]
+    f   = ft[i]
+    pk  = _small_int(b, t0[f + 1], t1[f + 1])
+    ok  = ((t0[f + 5] < le[i]) & (pk >= 1) & (pk <= 8)
+           & (_is(b, t0[f + 2], b"Parameter-") | _is(b, t0[f + 2], b"Freq"))
+           & (_is(b, t0[f + 4], b"Parameter-") | _is(b, t0[f + 4], b"Mag")))
+    i_k, pk, f = i[ok], pk[ok], f[ok]
+
+    # ── One bulk cast, one scatter into the preallocated matrix ─
+    n1, nk = len(i_1), len(i_k)
+    r_1, a_1 = place(i_1)
+    r_k, a_k = place(i_k)
+    rec = np.concatenate((r_1, r_k, r_k))
+    ax  = np.concatenate((a_1, a_k, a_k))
+    k   = np.concatenate((k_1, 2 + 2 * pk, 3 + 2 * pk))
+    v   = _floats(b, np.concatenate((v_s, t0[f + 3], t0[f + 5])),
+                     np.concatenate((v_e, t1[f + 3], t1[f + 5])))
+    o   = (rec >= 0) & (ax >= 0)
+    o[n1:] &= ~np.tile(np.isnan(v[n1:n1 + nk]) | np.isnan(v[n1 + nk:]), 2)   # Peak lines: both or neither
+    out = np.full((len(ts_i), len(COLS_57) - 1), np.nan)
+    out[rec[o], 3 * (k[o] - 1) + ax[o]] = v[o]
+    return times, stamps, out
+
+
+def parse_arrays(txt: str):
+    """TXT session → (Time strings, datetime64[s] stamps, records × 57 float64 matrix).
+    A stamp is NaT where the time line could only be kept as raw text.
+    Also the API server's parse-on-ingest, so both sides read a TXT alike."""
+    raw   = txt.encode("utf-8", errors="replace")
+    parts = []
+    a = 0
+    while a < len(raw):
+        m = _TS_LINE.search(raw, a + _BLOCK) if a + _BLOCK < len(raw) else None
+        z = m.start() if m else len(raw)
+        parts.append(_parse_block(raw[a:z]))
+        a = z
+    if not parts:
+        return np.empty(0, dtype=object), np.empty(0, dtype="M8[s]"), np.empty((0, len(COLS_57) - 1))
+    return tuple(np.concatenate(p) for p in zip(*parts))
+
+
+def parse_57(txt: str) -> pd.DataFrame:
+    """TXT session → 57-feature frame (Time + Parameter-1..19 × X, Y, Z)."""
+    times, _, values = parse_arrays(txt)
+    if not len(times):
+        return pd.DataFrame(columns=COLS_57)
+    df = pd.DataFrame(values, columns=COLS_57[1:])
+    df.insert(0, "Time", times)
+    return df
+
+
+def table_frame(buf):
+    """Arrow IPC stream from the API's /sessions/{id}/table → the frame
+    parse_57 builds from the same TXT, without touching the text.  The API
+    stores float32; TXT values carry ≤ 7 significant digits, so rounding
+    there recovers the exact float64 that parsing the text would give.
+    None when a record's time is null — parse_57 keeps that line's raw
+    text, which only the TXT has."""
+    import pyarrow as pa
+    tbl = pa.ipc.open_stream(buf).read_all()
+    if tbl.column("Time").null_count:
+        return None
+    if not tbl.num_rows:
+        return pd.DataFrame(columns=COLS_57)
+    t   = tbl.column("Time").to_numpy().astype("M8[s]")
+    day, mon = t.astype("M8[D]"), t.astype("M8[M]")
+    sec = (t - day).astype(np.int64)
+    times = _fmt_ts(mon.astype(np.int64) % 12 + 1, (day - mon).astype(np.int64) + 1,
+                    t.astype("M8[Y]").astype(np.int64) + 1970, sec // 3600, sec // 60 % 60, sec % 60)
+    v = np.column_stack([tbl.column(c).to_numpy() for c in COLS_57[1:]]).astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        sc = 10.0 ** (6 - np.floor(np.log10(np.abs(v))))
+        w  = np.round(v * sc) / sc
+    df = pd.DataFrame(np.where(np.isfinite(w), w, v), columns=COLS_57[1:])
+    df.insert(0, "Time", times)
+    return df
+
+
+# ═══════════════════════════════════════════════════════════════════════
+#  57 → 19 FEATURES  ·  LABELS  ·  EXPORT FORMATS
+# ═══════════════════════════════════════════════════════════════════════
+def to19(df57: pd.DataFrame) -> pd.DataFrame:
+    """57-feature wide → 19-feature long: one X, Y, Z row per record.
+    Column 3·(k-1)+a is Parameter-k of axis a, so the value block is a
+    (records, 19, 3) grid and axis stacking is a single transpose."""
+    n, hl = len(df57), "Label" in df57.columns
+    v     = df57.reindex(columns=COLS_57[1:]).to_numpy(dtype=np.float64)
+    d     = pd.DataFrame(v.reshape(n, 19, 3).transpose(0, 2, 1).reshape(n * 3, 19),
+                         columns=[f"Parameter-{k}" for k in range(1, 20)])
+    d.insert(0, "Time", np.repeat(df57["Time"].to_numpy(), 3))
+    if hl: d["Label"] = np.repeat(df57["Label"].to_numpy(), 3)
+    return d
+
+
+def label_frame(df57: pd.DataFrame, label) -> pd.DataFrame:
+    """Attach a LABEL_MAP label (key or numeric value) as the Label column."""
+    df = df57.copy()
+    df["Label"] = LABEL_MAP.get(label, label)
+    return df
+
+
+def typed_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """float32 parameters · datetime64 Time · int8 Label."""
+    t = df.astype({c: np.float32 for c in df.columns if c.startswith("Parameter-")})
+    t["Time"] = pd.to_datetime(t["Time"], format="%d/%m/%Y %H:%M:%S", errors="coerce")
+    if "Label" in t.columns: t["Label"] = t["Label"].astype(np.int8)
+    return t
+
+
+def write_frame(df: pd.DataFrame, dest, fmt: str = "CSV"):
+    """Write one frame to a path or binary buffer in an EXPORT_FMT format."""
+    if fmt.startswith("CSV"):
+        df.to_csv(dest, index=False, chunksize=20_000, compression=EXPORT_FMT[fmt][2])
+    elif fmt.startswith("Parquet"):
+        typed_frame(df).to_parquet(dest, index=False, compression="zstd")
+    else:
+        typed_frame(df).to_feather(dest)
+
+
+# ═══════════════════════════════════════════════════════════════════════
+#  EXTRACT META FROM TXT CONTENT
+#  API only sends {"content": "..."} — no device fields in payload.
+#  Device name: supplied via manual input before fetch.
+#  Sampling rate, duration, all stats derived from TXT timestamps.
+# ═══════════════════════════════════════════════════════════════════════
+def extract_meta(content: str, device_name_override: str = "",
+                 payload: dict = None) -> dict:
+    """
+    Extract session metadata.
+    Priority for each field:
+      1. API payload keys  (device_name, sampling_rate, duration_val)  ← from api_server.py
+      2. Manual text input (device_name_override)
+      3. Auto-detect from TXT timestamps
+    """
+    payload = payload or {}
+    tre  = re.compile(r"(\d+/\d+/\d+)\s+(\d+:\d+:\d+)\s+(AM|PM)")
+    ts   = tre.findall(content)
+    t_s  = f"{ts[0][0]} {ts[0][1]} {ts[0][2]}"    if ts else "—"
+    t_e  = f"{ts[-1][0]} {ts[-1][1]} {ts[-1][2]}" if ts else "—"
+    rec  = content.count("#Vibration Value")
+    sz   = round(len(content) / 1024, 1)
+
+    # ── Device name ───────────────────────────────────────────
+    # payload["device_name"] comes from device.py via api_server.py
+    dn = "—"
+    raw_dn = payload.get("device_name") or device_name_override
+    if raw_dn and str(raw_dn).strip().lower() not in ("", "none", "null", "-"):
+        dn = str(raw_dn).strip()
+
+    # ── Sampling rate ─────────────────────────────────────────
+    # payload["sampling_rate"] is the int seconds value from device.py
+    sr, sr_secs = "—", None
+    raw_sr = payload.get("sampling_rate")
+    if raw_sr is not None:
+        try:
+            sr_secs = int(raw_sr)
+            sr = SR_LABEL.get(sr_secs, f"{sr_secs} sec")
+        except: pass
+    # Fallback: auto-detect from consecutive timestamps
+    if sr_secs is None and len(ts) >= 2:
+        try:
+            fmt = "%m/%d/%Y %I:%M:%S %p"
+            d   = int(abs((
+                datetime.strptime(f"{ts[1][0]} {ts[1][1]} {ts[1][2]}", fmt) -
+                datetime.strptime(f"{ts[0][0]} {ts[0][1]} {ts[0][2]}", fmt)
+            ).total_seconds()))
+            if 1 <= d <= 300:
+                sr_secs = d
+                sr = SR_LABEL.get(d, f"{d} sec")
+        except: pass
+
+    # ── Duration ──────────────────────────────────────────────
+    # payload["duration_val"] is int hours from device.py
+    dur, dur_hours = "—", None
+    raw_dur = payload.get("duration_val")
+    if raw_dur is not None:
+        try:
+            dur_hours = int(raw_dur)
+            dur = f"{dur_hours} hour{'s' if dur_hours != 1 else ''}"
+        except: pass
+    # Fallback: compute from timestamp span
+    if dur_hours is None and len(ts) >= 2:
+        try:
+            fmt  = "%m/%d/%Y %I:%M:%S %p"
+            secs = int((
+                datetime.strptime(f"{ts[-1][0]} {ts[-1][1]} {ts[-1][2]}", fmt) -
+                datetime.strptime(f"{ts[0][0]} {ts[0][1]} {ts[0][2]}",   fmt)
+            ).total_seconds())
+            if secs > 0:
+                h, m = secs // 3600, (secs % 3600) // 60
+                dur = f"{h}h {m:02d}m" if h else f"{m}m {secs%60:02d}s"
+                dur_hours = max(1, h)
+        except: pass
+
+    # ── Derived stats ─────────────────────────────────────────
+    rph = exp_rec = completeness = "—"
+    if sr_secs:
+        rph = f"{3600 // sr_secs:,}"
+        if dur_hours:
+            exp = (dur_hours * 3600) // sr_secs
+            exp_rec = f"{exp:,}"
+            if rec > 0 and exp > 0:
+                completeness = f"{min(100.0, round(rec / exp * 100, 1))}%"
+
+    return dict(
+        device_name=dn,   sampling_rate=sr,  duration=dur,
+        records=rec,      expected_rec=exp_rec, rec_per_hour=rph,
+        completeness=completeness,
+        t_start=t_s,      t_end=t_e,
+        size_kb=sz,
+        fetched_at=datetime.now().strftime("%H:%M:%S"),
+        fetched_date=datetime.now().strftime("%d %b %Y"),
+    )
+
+
+# ═══════════════════════════════════════════════════════════════════════
+#  BATCH CONVERTER  (CLI)
+#  Workers parse + write one TXT each; the parent streams the merged
+#  outputs in input order, so memory stays at a few sessions at a time.
+#  STATE_FILE in the output directory records what each output was made
+#  from (source mtime + size, label, format, record count), so reruns
+#  skip only what is really up to date — inputs without records included.
+# ═══════════════════════════════════════════════════════════════════════
+FMT_BY_EXT = {ext[1:]: k for k, (ext, _, _) in EXPORT_FMT.items()}
+STATE_FILE = ".vdc_state.json"
+
+
+def _stamp(src: str, fmt: str, label) -> list:
+    st = os.stat(src)
+    return [st.st_mtime_ns, st.st_size, fmt, LABEL_MAP.get(label, label)]
+
+
+def _load_state(out_dir: str) -> dict:
+    try:
+        with open(os.path.join(out_dir, STATE_FILE), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError): return {}
+
+
+def _save_state(out_dir: str, state: dict):
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(path + ".part", "w", encoding="utf-8") as fh:
+        json.dump(state, fh)
+    os.replace(path + ".part", path)
+
+
+def _convert(job: tuple):
+    """Worker: one TXT → per-file outputs; returns frames only if merging."""
+    src, o57, o19, fmt, label, write, keep = job
+    with open(src, encoding="utf-8", errors="replace") as fh:
+        df57 = parse_57(fh.read())
+    if label is not None and not df57.empty:
+        df57 = label_frame(df57, label)
+    df19 = to19(df57)
+    write = write and not df57.empty
+    if write:
+        os.makedirs(os.path.dirname(o57), exist_ok=True)
+        for df, out in ((df57, o57), (df19, o19)):
+            write_frame(df, out + ".part", fmt)
+            os.replace(out + ".part", out)
+    return src, len(df57), write, (df57, df19) if keep else None
+
+
+class MergedWriter:
+    """Appends frames to one output file without holding them all in memory."""
+
+    def __init__(self, path: str, fmt: str):
+        self.path, self.fmt, self.tmp = path, fmt, path + ".part"
+        self.fh = self.pq = None
+        self.rows = 0
+
+    def write(self, df: pd.DataFrame):
+        if df.empty: return
+        if self.fmt.startswith("CSV"):
+            if self.fh is None:
+                comp = EXPORT_FMT[self.fmt][2]
+                self.fh = (gzip.open(self.tmp, "wb") if comp == "gzip" else
+                           zstandard.open(self.tmp, "wb") if comp == "zstd" else
+                           open(self.tmp, "wb"))
+            df.to_csv(self.fh, index=False, header=self.rows == 0)
+        else:
+            import pyarrow as pa, pyarrow.parquet as pq
+            tbl = pa.Table.from_pandas(typed_frame(df), preserve_index=False)
+            if self.pq is None:
+                self.pq = (pq.ParquetWriter(self.tmp, tbl.schema, compression="zstd")
+                           if self.fmt.startswith("Parquet") else
+                           pa.ipc.new_file(self.tmp, tbl.schema,
+                                           options=pa.ipc.IpcWriteOptions(compression="lz4")))
+            self.pq.write_table(tbl)
+        self.rows += len(df)
+
+    def close(self):
+        for h in (self.fh, self.pq):
+            if h is not None: h.close()
+        if self.rows: os.replace(self.tmp, self.path)
+
+
+def convert_tree(src_dir: str, out_dir: str, fmt: str = "CSV", label=None,
+                 merged: bool = False, jobs: int = None, force: bool = False) -> dict:
+    """Convert every *.txt under src_dir; returns counts for the summary line."""
+    ext   = EXPORT_FMT[fmt][0]
+    srcs  = sorted(os.path.join(d, f) for d, _, fs in os.walk(src_dir)
+                   for f in fs if f.lower().endswith(".txt"))
+    m57   = os.path.join(out_dir, f"Merged_57feat{ext}")
+    m19   = os.path.join(out_dir, f"Merged_19feat{ext}")
+    state = _load_state(out_dir)
+    done  = state.setdefault("files", {})     # relative path → {"stamp", "records"}
+    todo, stamps = [], {}
+    for src in srcs:
+        rel   = os.path.relpath(src, src_dir)
+        base  = os.path.join(out_dir, os.path.splitext(rel)[0])
+        o57, o19 = f"{base}_57feat{ext}", f"{base}_19feat{ext}"
+        stamps[src] = stamp = _stamp(src, fmt, label)
+        prev  = done.get(rel)
+        fresh = (prev is not None and prev["stamp"] == stamp
+                 and (prev["records"] == 0 or (os.path.exists(o57) and os.path.exists(o19))))
+        todo.append((src, o57, o19, fmt, label, force or not fresh, merged))
+    msig = hashlib.blake2b(json.dumps(sorted(stamps.items())).encode(), digest_size=16).hexdigest()
+    if merged and not force:                  # merged is stale if any input, the label or format changed
+        merged = not (state.get("merged") == msig and os.path.exists(m57) and os.path.exists(m19))
+    skipped = sum(not j[5] for j in todo)
+    if not merged:
+        todo = [j[:6] + (False,) for j in todo if j[5]]
+
+    stats = dict(files=len(srcs), converted=0, skipped=skipped, empty=0, records=0)
+    os.makedirs(out_dir, exist_ok=True)
+    w57, w19 = (MergedWriter(m57, fmt), MergedWriter(m19, fmt)) if merged else (None, None)
+    with Pool(jobs or os.cpu_count()) as pool:
+        for src, n, wrote, frames in pool.imap(_convert, todo):
+            done[os.path.relpath(src, src_dir)] = {"stamp": stamps[src], "records": n}
+            stats["records"] += n
+            if n == 0:   stats["empty"] += 1
+            if wrote:    stats["converted"] += 1
+            if frames:   w57.write(frames[0]); w19.write(frames[1])
+            print(f"{'✓' if wrote else '·' if n else '∅'} {n:>7,}  {os.path.relpath(src, src_dir)}")
+    if merged:
+        w57.close(); w19.close()
+        state["merged"] = msig
+    state["files"] = {os.path.relpath(src, src_dir): done[os.path.relpath(src, src_dir)]
+                      for src in srcs if os.path.relpath(src, src_dir) in done}
+    _save_state(out_dir, state)
+    return stats
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Convert device TXT files to 57/19-feature datasets.")
+    ap.add_argument("src", help="directory searched recursively for *.txt")
+    ap.add_argument("-o", "--out", required=True, help="output directory (tree is mirrored)")
+    ap.add_argument("-f", "--format", default="csv", choices=sorted(FMT_BY_EXT),
+                    help="output format (default: csv)")
+    ap.add_argument("-l", "--label", default=None,
+                    help="attach a Label column — LABEL_MAP key or its number, e.g. 2")
+    ap.add_argument("-m", "--merged", action="store_true", help="also write Merged_57feat / Merged_19feat")
+    ap.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    ap.add_argument("--force", action="store_true", help="rewrite outputs even if up to date")
+    a = ap.parse_args(argv)
+
+    label = a.label
+    if label is not None and label not in LABEL_MAP:
+        try:    label = int(label)
+        except ValueError: ap.error(f"unknown label {label!r}; use one of {list(LABEL_MAP)} or 0-5")
+        if label not in LABEL_MAP.values(): ap.error(f"label must be one of {sorted(LABEL_MAP.values())}")
+
+    t0 = time.perf_counter()
+    st = convert_tree(a.src, a.out, FMT_BY_EXT[a.format], label, a.merged, a.jobs, a.force)
+    print(f"{st['files']} files · {st['converted']} converted · {st['skipped']} up to date · "
+          f"{st['empty']} without records · {st['records']:,} records · {time.perf_counter() - t0:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
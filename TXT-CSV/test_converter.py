@@ -0,0 +1,212 @@
+"""
+Regression tests for the vectorised parse_57 / to19.
+
+The reference implementations below are the original row-by-row parser
+and 57 → 19 reshaper from app.py, frozen as they were before the
+vectorised rewrite.  Every input here must give the same frame from both.
+
+    cd TXT-CSV && python -m pytest -q
+"""
+import os, re, sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Device"))
+
+from converter import COLS_57, label_frame, parse_57, to19
+from generator import render_records
+
+
+# ─── Frozen reference (row-wise originals) ──────────────────────────────────────
+def ref_parse_57(txt: str) -> pd.DataFrame:
+    rows, i = [], 0
+    lines   = [l.strip() for l in txt.splitlines() if l.strip()]
+    tre     = re.compile(r"\d+/\d+/\d+\s+\d+:\d+:\d+\s+(AM|PM)")
+    pnr     = re.compile(r"Peak\s+(\d+)\s+Parameter-\d+\s+([-\d.]+)\s+Parameter-\d+\s+([-\d.]+)")
+    por     = re.compile(r"Peak\s+(\d+)\s+Freq\s+([-\d.]+)\s+Mag\s+([-\d.]+)")
+
+    def _f(tok, j):
+        try:    return float(tok[j])
+        except: return None
+
+    while i < len(lines):
+        if tre.match(lines[i]):
+            try:    row = {"Time": datetime.strptime(lines[i].strip(), "%m/%d/%Y %I:%M:%S %p").strftime("%d/%m/%Y %H:%M:%S")}
+            except: row = {"Time": lines[i].strip()}
+            i += 1
+            for axis in ["X", "Y", "Z"]:
+                while i < len(lines) and f"{axis} Axis" not in lines[i]: i += 1
+                i += 1
+                peaks = {}
+                while i < len(lines) and not lines[i].endswith("Axis:") and not tre.match(lines[i]):
+                    line, tok = lines[i], lines[i].split()
+                    if tok and re.match(r"^Parameter-(\d+)$", tok[0]):
+                        pn = int(tok[0].split("-")[1])
+                        if   pn == 1: row[f"Parameter-1_{axis}"] = _f(tok, 1)
+                        elif pn == 2: row[f"Parameter-2_{axis}"] = _f(tok, 1)
+                        elif pn == 3: row[f"Parameter-3_{axis}"] = _f(tok, 1)
+                        i += 1; continue
+                    if   line.startswith("RMS"):     row[f"Parameter-1_{axis}"] = _f(tok, 1)
+                    elif line.startswith("PP"):       row[f"Parameter-2_{axis}"] = _f(tok, 1)
+                    elif line.startswith("Kurtosis"): row[f"Parameter-3_{axis}"] = _f(tok, 1)
+                    else:
+                        m = pnr.match(line) or por.match(line)
+                        if m: peaks[int(m.group(1))] = (float(m.group(2)), float(m.group(3)))
+                    i += 1
+                for p in range(1, 9):
+                    fp, mp = 2 + p*2, 2 + p*2 + 1
+                    row[f"Parameter-{fp}_{axis}"] = peaks.get(p, (None,None))[0]
+                    row[f"Parameter-{mp}_{axis}"] = peaks.get(p, (None,None))[1]
+            rows.append(row)
+        else:
+            i += 1
+
+    df = pd.DataFrame(rows)
+    for c in COLS_57:
+        if c not in df.columns: df[c] = pd.NA
+    return df[COLS_57]
+
+
+def ref_to19(df57: pd.DataFrame) -> pd.DataFrame:
+    rows, hl = [], "Label" in df57.columns
+    for _, row in df57.iterrows():
+        for axis in ["X","Y","Z"]:
+            nr = {"Time": row.get("Time", pd.NA)}
+            for n in range(1, 20): nr[f"Parameter-{n}"] = row.get(f"Parameter-{n}_{axis}", pd.NA)
+            if hl: nr["Label"] = row["Label"]
+            rows.append(nr)
+    c19 = ["Time"] + [f"Parameter-{n}" for n in range(1, 20)] + (["Label"] if hl else [])
+    return pd.DataFrame(rows)[c19]
+
+
+def as_floats(df: pd.DataFrame) -> pd.DataFrame:
+    """NA/None → NaN and float64 parameters, so both frames compare cell by cell."""
+    out = df.copy()
+    for c in out.columns:
+        if c.startswith("Parameter-"):
+            out[c] = pd.to_numeric(out[c].astype(object).where(out[c].notna(), np.nan)).astype(np.float64)
+    return out.reset_index(drop=True)
+
+
+def assert_same(new: pd.DataFrame, ref: pd.DataFrame):
+    assert list(new.columns) == list(ref.columns)
+    pd.testing.assert_frame_equal(as_floats(new), as_floats(ref), check_dtype=False)
+
+
+# ─── Inputs ─────────────────────────────────────────────────────────────────────
+GENERATED = render_records(np.random.default_rng(7), datetime(2024, 1, 1, 11, 59, 30), 5, 40)
+MULTIBLOCK = render_records(np.random.default_rng(8), datetime(2024, 1, 1, 23, 0, 0), 1, 3000)   # > _BLOCK bytes
+
+LEGACY = """#Vibration Value
+3/9/2024 1:05:00 PM
+X Axis:
+RMS 0.12
+PP 0.95
+Kurtosis 1.3
+Peak 1 Freq 25 Mag -31.5
+Peak 2 Freq 50 Mag -40.25
+Y Axis:
+RMS 0.08
+PP 0.5
+Kurtosis -0.2
+Peak 8 Freq 120 Mag -23
+Z Axis:
+RMS 0.2
+PP 1.1
+Kurtosis 0.7
+"""
+
+MALFORMED = """garbage before the first record
+#Vibration Value
+1/2/2024 12:00:05 AM
+X Axis:
+Parameter-1
+Parameter-2 abc
+Parameter-3 0.5 extra tokens
+Peak 1 Parameter-4 30
+Peak 2 Parameter-6 x Parameter-7 -30.1
+Peak 3 Parameter-8 44 Parameter-9 -33.3
+   Peak 4 Parameter-10   45   Parameter-11   -34.4
+Y Axis:
+
+Z Axis:
+Parameter-1 0.11
+Peak 9 Parameter-20 1 Parameter-21 2
+
+#Vibration Value
+13/45/2024 10:00:00 AM
+X Axis:
+Parameter-1 1.0
+Y Axis:
+Parameter-2 2.0
+Z Axis:
+Parameter-3 3.0
+"""
+
+# The row-wise parser scanned forward for each axis header regardless of
+# record boundaries, so a record missing an axis swallowed the next one.
+# parse_57 bounds every record by the next timestamp; checked on its own.
+MISSING_AXIS = """#Vibration Value
+1/2/2024 12:00:05 AM
+X Axis:
+Parameter-1 0.1
+Z Axis:
+Parameter-1 0.3
+#Vibration Value
+1/2/2024 12:00:10 AM
+X Axis:
+Parameter-1 1.1
+Y Axis:
+Parameter-1 1.2
+Z Axis:
+Parameter-1 1.3
+"""
+
+TRUNCATED = GENERATED + "#Vibration Value\n1/1/2024 12:03:00 PM\nX Axis:\nParameter-20 -5.5\nPeak 1 Parameter-4"
+
+CASES = {"generated": GENERATED, "multiblock": MULTIBLOCK, "legacy": LEGACY,
+         "malformed": MALFORMED, "truncated": TRUNCATED}
+
+
+# ─── Tests ──────────────────────────────────────────────────────────────────────
+@pytest.mark.parametrize("name", CASES)
+def test_parse_57_matches_reference(name):
+    assert_same(parse_57(CASES[name]), ref_parse_57(CASES[name]))
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_to19_matches_reference(name):
+    df57 = parse_57(CASES[name])
+    assert_same(to19(df57), ref_to19(df57))
+    labelled = label_frame(df57, 2)
+    assert_same(to19(labelled), ref_to19(labelled))
+
+
+def test_malformed_values():
+    df = parse_57(MALFORMED)
+    assert len(df) == 2
+    first = df.iloc[0]
+    assert first["Time"] == "02/01/2024 00:00:05"
+    assert pd.isna(first["Parameter-1_X"]) and pd.isna(first["Parameter-2_X"])
+    assert first["Parameter-3_X"] == 0.5
+    assert pd.isna(first["Parameter-4_X"]) and pd.isna(first["Parameter-6_X"])       # short / unparsable peaks
+    assert (first["Parameter-8_X"], first["Parameter-9_X"]) == (44.0, -33.3)
+    assert (first["Parameter-10_X"], first["Parameter-11_X"]) == (45.0, -34.4)
+    assert pd.isna(first["Parameter-1_Y"]) and first["Parameter-1_Z"] == 0.11
+    assert df.iloc[1]["Time"] == "13/45/2024 10:00:00 AM"                            # kept verbatim
+
+
+def test_missing_axis_keeps_next_record():
+    df = parse_57(MISSING_AXIS)
+    assert df["Time"].tolist() == ["02/01/2024 00:00:05", "02/01/2024 00:00:10"]
+    assert df["Parameter-1_X"].tolist() == [0.1, 1.1]
+    assert pd.isna(df.iloc[0]["Parameter-1_Y"]) and df.iloc[0]["Parameter-1_Z"] == 0.3
+    assert df.iloc[1][["Parameter-1_Y", "Parameter-1_Z"]].tolist() == [1.2, 1.3]
+
+
+def test_empty_input():
+    assert list(parse_57("no records here\n").columns) == COLS_57
+    assert parse_57("").empty